@@ -0,0 +1,66 @@
+"""Fast base58check encoding of 21-byte Tron addresses.
+
+base58.b58encode_check() converts to base 58 one digit at a time with
+generic big-integer arithmetic. A Tron address with its 4-byte checksum is
+always 25 bytes, at most 35 base58 digits, so here the conversion is
+unrolled into a fixed 18 divisions by 58**2, each looking up two digits
+at once in a 3364-entry table. Other input lengths fall back to the base58
+package. The output is identical to base58.b58encode_check(key).decode().
+"""
+
+import functools
+import hashlib
+
+import base58
+
+ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+ADDRESS_LENGTH = 21
+
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+
+
+def encode_address(key, _sha256=hashlib.sha256, _pairs=_PAIRS):
+    """Returns the base58check string of a raw address."""
+    if len(key) != ADDRESS_LENGTH:
+        return base58.b58encode_check(key).decode('utf-8')
+    data = key + _sha256(_sha256(key).digest()).digest()[:4]
+    n = int.from_bytes(data, 'big')
+    n, r0 = divmod(n, 3364)
+    n, r1 = divmod(n, 3364)
+    n, r2 = divmod(n, 3364)
+    n, r3 = divmod(n, 3364)
+    n, r4 = divmod(n, 3364)
+    n, r5 = divmod(n, 3364)
+    n, r6 = divmod(n, 3364)
+    n, r7 = divmod(n, 3364)
+    n, r8 = divmod(n, 3364)
+    n, r9 = divmod(n, 3364)
+    n, r10 = divmod(n, 3364)
+    n, r11 = divmod(n, 3364)
+    n, r12 = divmod(n, 3364)
+    n, r13 = divmod(n, 3364)
+    n, r14 = divmod(n, 3364)
+    n, r15 = divmod(n, 3364)
+    r17, r16 = divmod(n, 3364)
+    p = _pairs
+    encoded = ''.join((p[r17], p[r16], p[r15], p[r14], p[r13], p[r12], p[r11], p[r10], p[r9],
+                       p[r8], p[r7], p[r6], p[r5], p[r4], p[r3], p[r2], p[r1], p[r0])).lstrip('1')
+    if data[0]:
+        return encoded
+    # Each leading zero byte is written as a '1'.
+    return '1' * (len(data) - len(data.lstrip(b'\0'))) + encoded
+
+
+def encode_addresses(keys):
+    """Encodes a list of raw addresses. Returns a list of strings."""
+    encode = encode_address
+    return [encode(key) for key in keys]
+
+
+def cached_encoder(maxsize=1 << 16):
+    """Returns an encode_address with an LRU cache of maxsize entries.
+
+    Worth it where the same addresses repeat, such as vote addresses or
+    proposal approvals; account keys are all distinct.
+    """
+    return functools.lru_cache(maxsize=maxsize)(encode_address)
@@ -0,0 +1,376 @@
+"""Indexed queries over the exported tron_balances.db.
+
+Top-N lists and balance ranges read the balance index created during the
+export. Ranks, percentiles and the balance histogram come from summary
+tables that build_summaries() writes at the end of every SQLite export:
+
+    balance_checkpoints   every CHECKPOINT_STEP-th balance in descending
+                          order, with the exact number of accounts above it
+                          and at or above it
+    balance_percentiles   the balance at each percentile 0..100
+    balance_histogram     accounts and total balance per TRX decade
+    balance_summary       account count, total balance and build time
+
+The rank of a balance is the number of accounts at or above the nearest
+higher checkpoint plus an index count of the balances between the two,
+which lie between adjacent checkpoints: at most CHECKPOINT_STEP rows, so
+it costs the same on a 100M-row table as on a small one. Batched lookups
+are answered with one statement, whatever the number of addresses.
+
+    python balance_query.py top 100
+    python balance_query.py lookup TXYZ... TABC... --format json
+    python balance_query.py histogram --edges 1 1000 1000000
+    python balance_query.py range --min 1000 --max 5000 --limit 50
+"""
+
+import argparse
+import csv
+import json
+import math
+import sqlite3
+import sys
+import time
+
+from output_sinks import SUN_PER_TRX, create_balance_index, setup_database
+
+DEFAULT_DB = 'tron_balances.db'
+CHECKPOINT_STEP = 1024
+MAX_SUN = (1 << 63) - 1
+
+
+def setup_summaries(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS balance_checkpoints (
+            balance_sun INTEGER PRIMARY KEY,
+            above INTEGER NOT NULL,
+            at_or_above INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS balance_percentiles (
+            percentile INTEGER PRIMARY KEY,
+            balance_sun INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS balance_histogram (
+            bucket INTEGER PRIMARY KEY,
+            accounts INTEGER NOT NULL,
+            total_sun INTEGER NOT NULL,
+            min_sun INTEGER NOT NULL,
+            max_sun INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("CREATE TABLE IF NOT EXISTS balance_summary (name TEXT PRIMARY KEY, value)")
+
+
+def bucket_label(bucket):
+    """Describes a balance_histogram bucket in TRX."""
+    if bucket == 0:
+        return '0'
+    if bucket == 1:
+        return '< 1'
+    return f"{10 ** (bucket - 2):,} - {10 ** (bucket - 1):,}"
+
+
+def build_summaries(conn, step=CHECKPOINT_STEP):
+    """Rebuilds the rank, percentile and histogram tables from the accounts table."""
+    create_balance_index(conn)
+    # Recreated rather than emptied, in case it has the columns of an older version.
+    conn.execute("DROP TABLE IF EXISTS balance_checkpoints")
+    setup_summaries(conn)
+    total = conn.execute("SELECT COUNT(balance_sun) FROM accounts").fetchone()[0]
+    # Descending positions of the percentiles (nearest rank, ascending order).
+    percentile_positions = {}
+    for p in range(101):
+        rank = max(1, math.ceil(p * total / 100))
+        percentile_positions.setdefault(total - rank, []).append(p)
+
+    with conn:
+        conn.execute("DELETE FROM balance_checkpoints")
+        conn.execute("DELETE FROM balance_percentiles")
+        conn.execute("DELETE FROM balance_histogram")
+        conn.execute("DELETE FROM balance_summary")
+        if total:
+            # One ordered pass over the balance index. RANK() - 1 is the number
+            # of accounts with a strictly higher balance, and COUNT(*) over the
+            # default frame (which includes ties) those with a higher or equal one.
+            rows = conn.execute('''
+                SELECT position, balance_sun, above, at_or_above FROM (
+                    SELECT balance_sun,
+                           ROW_NUMBER() OVER w - 1 AS position,
+                           RANK() OVER w - 1 AS above,
+                           COUNT(*) OVER w AS at_or_above
+                    FROM accounts WHERE balance_sun IS NOT NULL
+                    WINDOW w AS (ORDER BY balance_sun DESC))
+                WHERE position % ? = 0 OR position IN (SELECT value FROM json_each(?))
+            ''', (step, json.dumps(list(percentile_positions))))
+            checkpoints = []
+            percentiles = []
+            for position, balance_sun, above, at_or_above in rows:
+                if position % step == 0:
+                    checkpoints.append((balance_sun, above, at_or_above))
+                for p in percentile_positions.get(position, ()):
+                    percentiles.append((p, balance_sun))
+            conn.executemany("INSERT OR IGNORE INTO balance_checkpoints (balance_sun, above, at_or_above) "
+                             "VALUES (?, ?, ?)", checkpoints)
+            conn.executemany("INSERT INTO balance_percentiles (percentile, balance_sun) VALUES (?, ?)",
+                             percentiles)
+        # Bucket 0 holds empty accounts, 1 those under 1 TRX, and bucket k
+        # balances from 10^(k-2) up to 10^(k-1) TRX.
+        conn.execute(f'''
+            INSERT INTO balance_histogram (bucket, accounts, total_sun, min_sun, max_sun)
+            SELECT CASE WHEN balance_sun = 0 THEN 0
+                        WHEN balance_sun < {SUN_PER_TRX} THEN 1
+                        ELSE LENGTH(balance_sun) - {len(str(SUN_PER_TRX))} + 2 END AS bucket,
+                   COUNT(*), SUM(balance_sun), MIN(balance_sun), MAX(balance_sun)
+            FROM accounts WHERE balance_sun IS NOT NULL GROUP BY bucket
+        ''')
+        total_sun = conn.execute("SELECT COALESCE(SUM(total_sun), 0) FROM balance_histogram").fetchone()[0]
+        conn.executemany("INSERT INTO balance_summary (name, value) VALUES (?, ?)", [
+            ('accounts', total),
+            ('total_sun', total_sun),
+            ('checkpoint_step', step),
+            ('built_at', int(time.time())),
+        ])
+
+
+def has_summaries(conn):
+    """True if the summary tables exist and are of the current version."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(balance_checkpoints)")]
+    return 'at_or_above' in columns and \
+        conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'balance_summary'").fetchone()[0] > 0
+
+
+def summary(conn):
+    return dict(conn.execute("SELECT name, value FROM balance_summary"))
+
+
+def count_above(conn, balance_sun):
+    """Returns the number of accounts with a balance strictly above balance_sun."""
+    checkpoint = conn.execute("SELECT balance_sun, at_or_above FROM balance_checkpoints WHERE balance_sun > ? "
+                              "ORDER BY balance_sun LIMIT 1", (balance_sun,)).fetchone()
+    if checkpoint is None:
+        # balance_sun is at or above the highest balance.
+        return conn.execute("SELECT COUNT(*) FROM accounts WHERE balance_sun > ?", (balance_sun,)).fetchone()[0]
+    upper, at_or_above = checkpoint
+    # The balances strictly between balance_sun and the checkpoint lie before
+    # the next lower checkpoint, so this counts at most CHECKPOINT_STEP rows.
+    return at_or_above + conn.execute("SELECT COUNT(*) FROM accounts WHERE balance_sun > ? AND balance_sun < ?",
+                                      (balance_sun, upper)).fetchone()[0]
+
+
+def top(conn, limit=100, offset=0):
+    """Returns the largest balances as [{'rank', 'address', 'balance_sun'}]."""
+    rows = conn.execute("SELECT address, balance_sun FROM accounts WHERE balance_sun IS NOT NULL "
+                        "ORDER BY balance_sun DESC LIMIT ? OFFSET ?", (limit, offset))
+    return [{'rank': offset + i + 1, 'address': address, 'balance_sun': balance_sun}
+            for i, (address, balance_sun) in enumerate(rows)]
+
+
+def lookup(conn, addresses):
+    """Looks up a batch of addresses in one statement.
+
+    Returns [{'address', 'balance_sun', 'rank', 'top_percent'}] in input
+    order; addresses that are not in the table have None values. rank is 1
+    plus the number of accounts with a higher balance.
+    """
+    total = int(summary(conn).get('accounts') or 0)
+    found = {}
+    rows = conn.execute('''
+        WITH wanted(address) AS (SELECT DISTINCT value FROM json_each(?)),
+        found AS (
+            SELECT a.address, a.balance_sun,
+                   (SELECT MIN(c.balance_sun) FROM balance_checkpoints c WHERE c.balance_sun > a.balance_sun)
+                       AS checkpoint
+            FROM wanted JOIN accounts a ON a.address = wanted.address)
+        SELECT address, balance_sun,
+               1 + CASE WHEN checkpoint IS NULL
+                   THEN (SELECT COUNT(*) FROM accounts x WHERE x.balance_sun > found.balance_sun)
+                   ELSE (SELECT at_or_above FROM balance_checkpoints c WHERE c.balance_sun = found.checkpoint)
+                        + (SELECT COUNT(*) FROM accounts x
+                           WHERE x.balance_sun > found.balance_sun AND x.balance_sun < found.checkpoint)
+                   END
+        FROM found
+    ''', (json.dumps(list(addresses)),))
+    for address, balance_sun, rank in rows:
+        found[address] = (balance_sun, rank)
+    result = []
+    for address in addresses:
+        balance_sun, rank = found.get(address, (None, None))
+        result.append({'address': address, 'balance_sun': balance_sun, 'rank': rank,
+                       'top_percent': round(100 * rank / total, 6) if rank and total else None})
+    return result
+
+
+def balance_range(conn, min_sun=None, max_sun=None, limit=100):
+    """Returns (count, rows) for balances between min_sun and max_sun inclusive.
+
+    count is exact and comes from the rank checkpoints; rows are the
+    largest `limit` balances in the range.
+    """
+    high = count_above(conn, min_sun - 1) if min_sun is not None else \
+        int(summary(conn).get('accounts') or 0)
+    low = count_above(conn, max_sun) if max_sun is not None else 0
+    sql = "SELECT address, balance_sun FROM accounts WHERE balance_sun IS NOT NULL"
+    params = []
+    if min_sun is not None:
+        sql += " AND balance_sun >= ?"
+        params.append(min_sun)
+    if max_sun is not None:
+        sql += " AND balance_sun <= ?"
+        params.append(max_sun)
+    sql += " ORDER BY balance_sun DESC LIMIT ?"
+    params.append(limit)
+    rows = [{'rank': low + i + 1, 'address': address, 'balance_sun': balance_sun}
+            for i, (address, balance_sun) in enumerate(conn.execute(sql, params))]
+    return max(high - low, 0), rows
+
+
+def histogram(conn, edges_sun=None):
+    """Returns histogram rows. Without edges, the precomputed TRX decades.
+
+    With edges (ascending sun values), each bucket counts the balances from
+    one edge up to the next, using the rank checkpoints.
+    """
+    if not edges_sun:
+        return [{'bucket': bucket_label(bucket), 'accounts': accounts, 'total_sun': total_sun,
+                 'min_sun': min_sun, 'max_sun': max_sun}
+                for bucket, accounts, total_sun, min_sun, max_sun in
+                conn.execute("SELECT bucket, accounts, total_sun, min_sun, max_sun FROM balance_histogram "
+                             "ORDER BY bucket")]
+    total = int(summary(conn).get('accounts') or 0)
+    # at_least[i]: accounts with a balance >= edges_sun[i].
+    at_least = [count_above(conn, edge - 1) for edge in edges_sun]
+    bounds = [None] + list(edges_sun)
+    counts = [total] + at_least + [0]
+    result = []
+    for i, lower in enumerate(bounds):
+        upper = edges_sun[i] if i < len(edges_sun) else None
+        label = (f"< {upper / SUN_PER_TRX:g}" if lower is None else
+                 f">= {lower / SUN_PER_TRX:g}" if upper is None else
+                 f"{lower / SUN_PER_TRX:g} - {upper / SUN_PER_TRX:g}")
+        result.append({'bucket': label, 'accounts': counts[i] - counts[i + 1]})
+    return result
+
+
+def percentiles(conn):
+    return [{'percentile': p, 'balance_sun': balance_sun}
+            for p, balance_sun in conn.execute("SELECT percentile, balance_sun FROM balance_percentiles "
+                                               "ORDER BY percentile")]
+
+
+def trx_to_sun(trx, rounding=round):
+    """Converts a TRX amount from the command line to sun, within SQLite's integer range."""
+    return max(-MAX_SUN, min(MAX_SUN, rounding(trx * SUN_PER_TRX)))
+
+
+def with_trx(rows):
+    """Adds a trx_balance value next to every balance_sun one."""
+    for row in rows:
+        if 'balance_sun' in row:
+            balance_sun = row['balance_sun']
+            row['trx_balance'] = None if balance_sun is None else balance_sun / SUN_PER_TRX
+    return rows
+
+
+def write_rows(rows, fmt, out):
+    if fmt == 'json':
+        json.dump(rows, out, indent=2)
+        out.write('\n')
+        return
+    if not rows:
+        return
+    columns = list(rows[0])
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    cells = [[('' if row[c] is None else str(row[c])) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    out.write('  '.join(c.ljust(w) for c, w in zip(columns, widths)).rstrip() + '\n')
+    for r in cells:
+        out.write('  '.join(v.ljust(w) for v, w in zip(r, widths)).rstrip() + '\n')
+
+
+def read_addresses(args):
+    addresses = list(args.addresses)
+    if args.file:
+        f = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+        with f:
+            addresses.extend(line.strip() for line in f if line.strip())
+    return addresses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the exported Tron balance database.')
+    parser.add_argument('--db-file', type=str, default=DEFAULT_DB, help='SQLite database written by read_tron_db.py.')
+    parser.add_argument('--format', choices=('text', 'json', 'csv'), default='text', help='Output format.')
+    # --format is also accepted after the command; SUPPRESS keeps the value given before it.
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--format', choices=('text', 'json', 'csv'), default=argparse.SUPPRESS, help='Output format.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_top = sub.add_parser('top', parents=[output], help='Largest balances.')
+    p_top.add_argument('limit', type=int, nargs='?', default=100, help='Number of accounts.')
+    p_top.add_argument('--offset', type=int, default=0, help='Skip this many accounts first.')
+
+    p_lookup = sub.add_parser('lookup', parents=[output], help='Balance and rank of a batch of addresses.')
+    p_lookup.add_argument('addresses', nargs='*', help='Base58 addresses.')
+    p_lookup.add_argument('--file', type=str, help="File with one address per line ('-' for stdin).")
+
+    p_hist = sub.add_parser('histogram', parents=[output], help='Account counts per balance bucket.')
+    p_hist.add_argument('--edges', type=float, nargs='+', help='Bucket edges in TRX (default: powers of ten).')
+
+    p_range = sub.add_parser('range', parents=[output], help='Accounts with a balance in a range.')
+    p_range.add_argument('--min', type=float, help='Minimum balance in TRX (inclusive).')
+    p_range.add_argument('--max', type=float, help='Maximum balance in TRX (inclusive).')
+    p_range.add_argument('--limit', type=int, default=100, help='Number of accounts to list.')
+
+    sub.add_parser('percentiles', parents=[output], help='Balance at each percentile.')
+    sub.add_parser('summarize', help='Rebuild the index and summary tables.')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'summarize':
+            # Also adds balance_sun to databases written by older versions.
+            conn = setup_database(args.db_file)
+        else:
+            conn = sqlite3.connect(f"file:{args.db_file}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"Error opening '{args.db_file}': {e}")
+        return
+
+    if args.command == 'summarize':
+        start = time.monotonic()
+        build_summaries(conn)
+        print(f"Built summaries for {summary(conn)['accounts']} accounts in {time.monotonic() - start:.1f}s.")
+        conn.close()
+        return
+    if not has_summaries(conn):
+        print(f"Error: '{args.db_file}' has no current summary tables; run 'python balance_query.py summarize' first.")
+        conn.close()
+        return
+
+    if args.command == 'top':
+        rows = top(conn, args.limit, args.offset)
+    elif args.command == 'lookup':
+        rows = lookup(conn, read_addresses(args))
+    elif args.command == 'histogram':
+        edges = sorted({trx_to_sun(edge) for edge in args.edges}) if args.edges else None
+        rows = histogram(conn, edges)
+    elif args.command == 'range':
+        min_sun = None if args.min is None else trx_to_sun(args.min, math.ceil)
+        max_sun = None if args.max is None else trx_to_sun(args.max, math.floor)
+        count, rows = balance_range(conn, min_sun, max_sun, args.limit)
+        if args.format == 'text':
+            print(f"{count} accounts in range.")
+    else:
+        rows = percentiles(conn)
+    conn.close()
+    write_rows(with_trx(rows), args.format, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
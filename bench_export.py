@@ -0,0 +1,126 @@
+"""Per-stage benchmark of the read_tron_db.py export pipeline.
+
+Each pass scans the whole account column family and runs the pipeline up
+to one more stage than the pass before:
+
+    iterate       RocksDB iteration only
+    parse         + balance decoding (tron_wire, the default path)
+    filter        + --min-balance filter
+    base58        + address encoding
+    sqlite        + bulk SQLite insert (a full export)
+
+The cost of a stage is the difference between its pass and the previous
+one. A separate full-parse pass measures decoding the complete Account
+message. Every pass runs in a fresh process, so its peak RSS is reported
+on its own.
+
+    python make_fixture.py /tmp/tron_fixture --accounts 1000000
+    python bench_export.py /tmp/tron_fixture
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from address_codec import encode_address
+from core.Tron_pb2 import Account
+from output_sinks import SUN_PER_TRX, open_sink
+from rocks_open import ScanSettings, open_for_scan, scan_read_options
+from tron_wire import decode_account_balance
+
+STAGES = ('iterate', 'parse', 'filter', 'base58', 'sqlite')
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_pass(db_path, cf_name, stage, min_balance, batch_size, full_parse=False):
+    """Runs the pipeline up to stage once. Returns (records, exported, seconds, peak_rss_mb)."""
+    depth = STAGES.index(stage)
+    min_sun = min_balance * SUN_PER_TRX
+    settings = ScanSettings()
+    db = open_for_scan(db_path, settings)
+    sink = None
+    out_dir = tempfile.mkdtemp(prefix='bench_export_')
+    if depth >= STAGES.index('sqlite'):
+        sink = open_sink('sqlite', os.path.join(out_dir, 'bench.db'), batch_size, bulk=True)
+    records = exported = 0
+    rows = []
+    start = time.perf_counter()
+    try:
+        for key, value in db.get_column_family(cf_name).items(read_opt=scan_read_options(settings)):
+            records += 1
+            if depth < 1:
+                continue
+            if full_parse:
+                balance = Account.FromString(value).balance
+            else:
+                balance = decode_account_balance(value)
+            if depth < 2 or balance < min_sun:
+                continue
+            exported += 1
+            if depth < 3:
+                continue
+            address = encode_address(key)
+            if sink is not None:
+                rows.append((address, balance))
+                if len(rows) >= batch_size:
+                    sink.write_rows(rows)
+                    rows = []
+        if sink is not None:
+            sink.write_rows(rows)
+            sink.close()
+    finally:
+        db.close()
+    seconds = time.perf_counter() - start
+    if sink is not None:
+        os.remove(sink.path)
+    os.rmdir(out_dir)
+    return records, exported, seconds, peak_rss_mb()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each stage of the account export pipeline.')
+    parser.add_argument('db_path', type=str, help='Path to the Tron RocksDB database directory.')
+    parser.add_argument('--cf', type=str, default='account', help='Account column family.')
+    parser.add_argument('--min-balance', type=float, default=0, help='Minimum TRX balance for the filter stage.')
+    parser.add_argument('--batch-size', type=int, default=10000, help='SQLite batch size.')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per pass; the fastest is reported.')
+    args = parser.parse_args()
+
+    passes = [(stage, False) for stage in STAGES] + [('parse', True)]
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    print(f"{'pass':12s} {'records':>10s} {'seconds':>8s} {'rec/s':>12s} {'stage cost':>12s} {'peak RSS':>10s}")
+    previous = None
+    for stage, full_parse in passes:
+        best = None
+        for _ in range(args.repeat):
+            with ctx.Pool(1) as pool:
+                result = pool.apply(run_pass, (args.db_path, args.cf, stage, args.min_balance,
+                                               args.batch_size, full_parse))
+            if best is None or result[2] < best[2]:
+                best = result
+        records, exported, seconds, rss = best
+        name = 'full-parse' if full_parse else stage
+        results[name] = best
+        if full_parse:
+            base = results['iterate'][2]
+        else:
+            base = previous
+        cost = f"{(seconds - base) / max(records, 1) * 1e6:.2f} us/rec" if base is not None else ''
+        print(f"{name:12s} {records:>10d} {seconds:>8.2f} {records / seconds:>12,.0f} {cost:>12s} {rss:>8.0f}MB")
+        if not full_parse:
+            previous = seconds
+    print(f"\nExported {results['sqlite'][1]} of {results['sqlite'][0]} records.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Compare full-scan throughput of the default and the scan-tuned RocksDB open.
+
+Each configuration opens the database, iterates one column family from
+start to end and reports records/s and MB/s. Runs alternate between the
+configurations so both see a similarly warm OS page cache; pass
+--drop-caches (Linux, root) to start every run cold.
+
+Note that the default configuration opens the database read-write, as
+read_tron_db.py used to, so it may replay the WAL or compact the copy.
+
+    python bench_scan_open.py /data/tron/output-directory --repeat 3
+"""
+
+import argparse
+import statistics
+import subprocess
+import time
+
+from rocks_open import DEFAULT_SETTINGS, ScanSettings, open_for_scan, scan_read_options
+
+
+def drop_caches():
+    subprocess.run(['sync'], check=True)
+    with open('/proc/sys/vm/drop_caches', 'w') as f:
+        f.write('3\n')
+
+
+def scan(db_path, cf_name, settings, limit=None):
+    """Scans cf_name once. Returns (records, bytes, seconds)."""
+    start = time.perf_counter()
+    db = open_for_scan(db_path, settings)
+    try:
+        cf = db.get_column_family(cf_name)
+        records = 0
+        size = 0
+        for key, value in cf.items(read_opt=scan_read_options(settings)):
+            records += 1
+            size += len(key) + len(value)
+            if limit is not None and records >= limit:
+                break
+    finally:
+        db.close()
+    return records, size, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full-scan throughput of RocksDB open settings.')
+    parser.add_argument('db_path', type=str, help='Path to the Tron RocksDB database directory.')
+    parser.add_argument('--cf', type=str, default='account', help='Column family to scan.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per configuration.')
+    parser.add_argument('--limit', type=int, help='Stop each scan after this many records.')
+    parser.add_argument('--block-cache-mb', type=int, default=32, help='Block cache size for the tuned open.')
+    parser.add_argument('--readahead-mb', type=int, default=8, help='Readahead size for the tuned open.')
+    parser.add_argument('--drop-caches', action='store_true', help='Drop the OS page cache before every run.')
+    args = parser.parse_args()
+
+    configs = [
+        ('default', DEFAULT_SETTINGS),
+        ('tuned', ScanSettings(block_cache_mb=args.block_cache_mb, readahead_mb=args.readahead_mb)),
+    ]
+    results = {name: [] for name, _ in configs}
+    for run in range(args.repeat):
+        for name, settings in configs:
+            if args.drop_caches:
+                drop_caches()
+            records, size, seconds = scan(args.db_path, args.cf, settings, args.limit)
+            results[name].append((records, size, seconds))
+            print(f"run {run + 1} {name:8s} {records} records in {seconds:.2f}s "
+                  f"({records / seconds:,.0f} rec/s, {size / seconds / 1e6:,.1f} MB/s)")
+
+    print()
+    for name, runs in results.items():
+        seconds = statistics.median(r[2] for r in runs)
+        records, size = runs[0][0], runs[0][1]
+        print(f"{name:8s} median {seconds:.2f}s  {records / seconds:,.0f} rec/s  {size / seconds / 1e6:,.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
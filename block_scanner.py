@@ -0,0 +1,313 @@
+"""Stream the transfers in a range of blocks of a Tron RocksDB database.
+
+java-tron stores blocks keyed by block id, whose first 8 bytes are the
+big-endian block number, so a block range is one ordered iterator seek.
+The scan is a chain of generators:
+
+    iter_blocks -> block_batches -> decode_batches -> sink
+
+decode_batches decodes batches of blocks in worker processes, keeping a
+bounded number of batches in flight and yielding them in block order.
+Each TRX (TransferContract), TRC10 (TransferAssetContract) and TRC20
+(TriggerSmartContract calling transfer/transferFrom) transfer becomes one
+row. The contract messages are not part of core/, so their fields are
+declared in tron_wire from java-tron's contract protos.
+
+Every --checkpoint-every blocks the output is flushed and the next block
+number is written to a checkpoint file. --resume continues from it and
+first drops whatever was written after the checkpoint, so an interrupted
+scan neither starts over nor writes a block twice.
+
+    python block_scanner.py /data/tron/output-directory --from-block 50000000 --to-block 51000000
+    python block_scanner.py /data/tron/output-directory --resume
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+import rocksdict
+
+from address_codec import cached_encoder
+from core.Tron_pb2 import Block, Transaction
+from output_sinks import open_table_sink
+from rocks_open import add_scan_arguments, open_for_scan, scan_read_options, settings_from_args
+from tron_wire import TransferAssetContract, TransferContract, TriggerSmartContract
+
+BLOCK_NUMBER_BYTES = 8
+TRANSFER_COLUMNS = (
+    ('block', 'integer'),
+    ('timestamp', 'integer'),
+    ('txid', 'text'),
+    ('tx_index', 'integer'),
+    ('kind', 'text'),
+    ('status', 'text'),
+    ('from_address', 'text'),
+    ('to_address', 'text'),
+    ('token', 'text'),
+    # TRC20 amounts are uint256, so amounts are kept as decimal text.
+    ('amount', 'text'),
+)
+KINDS = ('trx', 'trc10', 'trc20')
+DEFAULT_OUTPUTS = {'sqlite': 'tron_transfers.db', 'csv': 'tron_transfers.csv'}
+
+TRANSFER = Transaction.Contract.ContractType.Value('TransferContract')
+TRANSFER_ASSET = Transaction.Contract.ContractType.Value('TransferAssetContract')
+TRIGGER_SMART = Transaction.Contract.ContractType.Value('TriggerSmartContract')
+CONTRACT_RESULTS = Transaction.Result.DESCRIPTOR.fields_by_name['contractRet'].enum_type.values_by_number
+
+# ERC20/TRC20 function selectors.
+TRC20_TRANSFER = bytes.fromhex('a9059cbb')
+TRC20_TRANSFER_FROM = bytes.fromhex('23b872dd')
+
+_encode_cached = cached_encoder()
+
+
+def encode_address(raw):
+    return _encode_cached(raw) if raw else ''
+
+
+def abi_address(word):
+    """Returns the Tron address in a 32-byte ABI address word."""
+    return encode_address(b'\x41' + word[12:32])
+
+
+def block_key(number):
+    return number.to_bytes(BLOCK_NUMBER_BYTES, 'big')
+
+
+def iter_blocks(block_cf, from_block=0, to_block=None, read_opt=None):
+    """Yields (number, encoded Block) for the blocks from from_block to to_block inclusive."""
+    for key, value in block_cf.items(from_key=block_key(from_block), read_opt=read_opt):
+        number = int.from_bytes(key[:BLOCK_NUMBER_BYTES], 'big')
+        if to_block is not None and number > to_block:
+            break
+        yield number, value
+
+
+def block_batches(blocks, batch_size):
+    """Groups (number, value) pairs into lists of batch_size."""
+    batch = []
+    for item in blocks:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def contract_transfer(contract, kinds):
+    """Returns (kind, from, to, token, amount) for a transfer contract, or None."""
+    if contract.type == TRANSFER and 'trx' in kinds:
+        c = TransferContract.FromString(contract.parameter.value)
+        return 'trx', encode_address(c.owner_address), encode_address(c.to_address), '', c.amount
+    if contract.type == TRANSFER_ASSET and 'trc10' in kinds:
+        c = TransferAssetContract.FromString(contract.parameter.value)
+        return ('trc10', encode_address(c.owner_address), encode_address(c.to_address),
+                c.asset_name.decode('utf-8', 'replace'), c.amount)
+    if contract.type == TRIGGER_SMART and 'trc20' in kinds:
+        c = TriggerSmartContract.FromString(contract.parameter.value)
+        data = c.data
+        selector = data[:4]
+        if selector == TRC20_TRANSFER and len(data) >= 68:
+            return ('trc20', encode_address(c.owner_address), abi_address(data[4:36]),
+                    encode_address(c.contract_address), int.from_bytes(data[36:68], 'big'))
+        if selector == TRC20_TRANSFER_FROM and len(data) >= 100:
+            return ('trc20', abi_address(data[4:36]), abi_address(data[36:68]),
+                    encode_address(c.contract_address), int.from_bytes(data[68:100], 'big'))
+    return None
+
+
+def block_transfers(number, value, kinds=KINDS):
+    """Returns the TRANSFER_COLUMNS rows of one encoded block."""
+    block = Block.FromString(value)
+    timestamp = block.block_header.raw_data.timestamp
+    rows = []
+    for tx_index, tx in enumerate(block.transactions):
+        txid = None
+        for i, contract in enumerate(tx.raw_data.contract):
+            transfer = contract_transfer(contract, kinds)
+            if transfer is None:
+                continue
+            if txid is None:
+                txid = hashlib.sha256(tx.raw_data.SerializeToString()).hexdigest()
+            status = ''
+            if i < len(tx.ret):
+                result = CONTRACT_RESULTS.get(tx.ret[i].contractRet)
+                status = result.name if result is not None else str(tx.ret[i].contractRet)
+            kind, from_address, to_address, token, amount = transfer
+            rows.append((number, timestamp, txid, tx_index, kind, status, from_address, to_address,
+                         token, str(amount)))
+    return rows
+
+
+def decode_batch(batch, kinds=KINDS):
+    """Decodes a batch of blocks. Returns (first, last, blocks, rows, failed)."""
+    rows = []
+    failed = 0
+    for number, value in batch:
+        try:
+            rows.extend(block_transfers(number, value, kinds))
+        except Exception:
+            failed += 1
+    return batch[0][0], batch[-1][0], len(batch), rows, failed
+
+
+def decode_batches(batches, kinds=KINDS, workers=1):
+    """Yields decode_batch() results in block order, decoding in worker processes when workers > 1."""
+    if workers <= 1:
+        for batch in batches:
+            yield decode_batch(batch, kinds)
+        return
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers) as pool:
+        # Bounded window of batches in flight, so memory does not grow with the range.
+        pending = collections.deque()
+        for batch in batches:
+            pending.append(pool.apply_async(decode_batch, (batch, kinds)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def load_checkpoint(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def commit(sink, fmt):
+    """Writes buffered rows out. Returns the CSV file size to truncate to on resume."""
+    sink.flush()
+    if fmt == 'csv':
+        sink.file.flush()
+        return sink.file.tell()
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream the TRX, TRC10 and TRC20 transfers in a range of Tron blocks.')
+    parser.add_argument('db_path', type=str, help='Path to the Tron RocksDB database directory.')
+    parser.add_argument('--cf', type=str, default='block',
+                        help="Block column family (falls back to 'default' if it does not exist).")
+    parser.add_argument('--from-block', type=int, default=0, help='First block number.')
+    parser.add_argument('--to-block', type=int, help='Last block number (inclusive). Defaults to the newest block.')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS), help='Transfer kinds to export.')
+    parser.add_argument('--format', type=str, choices=tuple(DEFAULT_OUTPUTS), default='sqlite', help='Output format.')
+    parser.add_argument('--output', type=str, help='Output file. Defaults to tron_transfers.db or tron_transfers.csv.')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes decoding block batches.')
+    parser.add_argument('--batch-blocks', type=int, default=200, help='Blocks per decoded batch.')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows per output write.')
+    parser.add_argument('--checkpoint', type=str, help='Checkpoint file. Defaults to the output path + .checkpoint.')
+    parser.add_argument('--checkpoint-every', type=int, default=10000, help='Blocks between checkpoints.')
+    parser.add_argument('--resume', action='store_true', help='Continue the scan recorded in the checkpoint file.')
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+
+    output = args.output or DEFAULT_OUTPUTS[args.format]
+    checkpoint_file = args.checkpoint or output + '.checkpoint'
+    from_block, to_block = args.from_block, args.to_block
+    transfers = 0
+    if args.resume:
+        try:
+            state = load_checkpoint(checkpoint_file)
+        except (OSError, ValueError) as e:
+            print(f"Error reading checkpoint '{checkpoint_file}': {e}")
+            return
+        if state['format'] != args.format or state['kinds'] != sorted(args.kinds):
+            print(f"Error: checkpoint '{checkpoint_file}' is for a {state['format']} scan of {state['kinds']}.")
+            return
+        if state['done']:
+            print(f"Scan recorded in '{checkpoint_file}' is already complete.")
+            return
+        if args.to_block is not None and args.to_block != state['to_block']:
+            print(f"Error: checkpoint '{checkpoint_file}' ends at block {state['to_block']}, not {args.to_block}.")
+            return
+        from_block, to_block, transfers = state['next_block'], state['to_block'], state['transfers']
+        if args.format == 'csv':
+            # Drop rows written after the checkpoint.
+            try:
+                with open(output, 'r+b') as f:
+                    f.truncate(state['csv_offset'])
+            except OSError as e:
+                print(f"Error truncating '{output}': {e}")
+                return
+        print(f"Resuming at block {from_block} with {transfers} transfers already written.")
+
+    try:
+        cf_names = rocksdict.Rdict.list_cf(args.db_path)
+        cf_name = args.cf if args.cf in cf_names else 'default'
+        db = open_for_scan(args.db_path, settings_from_args(args))
+        block_cf = db.get_column_family(cf_name)
+        print(f"Using column family: '{cf_name}'")
+    except Exception as e:
+        print(f"Error opening database: {e}")
+        return
+
+    try:
+        sink = open_table_sink(args.format, output, 'transfers', TRANSFER_COLUMNS, args.batch_size,
+                               append=args.resume)
+    except Exception as e:
+        print(f"Error opening output: {e}")
+        db.close()
+        return
+    if args.resume and args.format == 'sqlite':
+        with sink.conn:
+            sink.conn.execute("DELETE FROM transfers WHERE block >= ?", (from_block,))
+
+    state = {'db_path': os.path.abspath(args.db_path), 'format': args.format, 'output': os.path.abspath(output),
+             'kinds': sorted(args.kinds), 'to_block': to_block, 'next_block': from_block,
+             'transfers': transfers, 'csv_offset': commit(sink, args.format), 'done': False}
+    save_checkpoint(checkpoint_file, state)
+
+    blocks = iter_blocks(block_cf, from_block, to_block, scan_read_options(settings_from_args(args)))
+    start = time.monotonic()
+    scanned = failed = 0
+    last_block = None
+    next_checkpoint = from_block + args.checkpoint_every
+    try:
+        for first, last, count, rows, batch_failed in decode_batches(block_batches(blocks, args.batch_blocks),
+                                                                     args.kinds, args.workers):
+            sink.write_rows(rows)
+            transfers += len(rows)
+            scanned += count
+            failed += batch_failed
+            last_block = last
+            if last >= next_checkpoint:
+                state.update(next_block=last + 1, transfers=transfers, csv_offset=commit(sink, args.format))
+                save_checkpoint(checkpoint_file, state)
+                next_checkpoint = last + args.checkpoint_every
+                print(f"\rBlock {last} ({scanned / (time.monotonic() - start):,.0f} blocks/s, "
+                      f"{transfers} transfers)...", end='', flush=True)
+    except KeyboardInterrupt:
+        sink.close()
+        db.close()
+        print(f"\nInterrupted. Resume from block {state['next_block']} with --resume.")
+        return
+
+    state.update(next_block=last_block + 1 if last_block is not None else from_block, transfers=transfers,
+                 csv_offset=commit(sink, args.format), done=True)
+    sink.close()
+    db.close()
+    save_checkpoint(checkpoint_file, state)
+    print(f"\nDone. Scanned {scanned} blocks in {time.monotonic() - start:.1f}s and wrote {transfers} "
+          f"transfers to '{output}'.")
+    if failed:
+        print(f"{failed} blocks could not be decoded.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Export several column families of a Tron RocksDB database in one run.
+
+Each supported column family is described by a ColumnFamilySpec in
+REGISTRY: the protobuf message type stored as its values and the rules
+that flatten a (key, message) pair into one output row. All requested
+column families are read through a single database handle and written to
+one SQLite database (a table per column family) or to one CSV, Parquet or
+Arrow file per column family.
+
+    python cf_extractor.py /data/tron/output-directory --cf witness --cf proposal
+"""
+
+import argparse
+import json
+import os
+import time
+
+import rocksdict
+
+from address_codec import cached_encoder, encode_address as encode_key
+from core.Tron_pb2 import (Account, DelegatedResource, DelegatedResourceAccountIndex,
+                           Exchange, Proposal, Witness)
+from output_sinks import DEFAULT_OUTPUTS, FORMATS, open_table_sink
+from rocks_open import add_scan_arguments, open_for_scan, scan_read_options, settings_from_args
+from tron_wire import slim_message_class
+
+
+# Witness, voter and approver addresses repeat across records.
+_encode_cached = cached_encoder()
+
+
+def encode_address(raw):
+    """Returns the base58check form of a raw address, or '' when empty."""
+    return _encode_cached(raw) if raw else ''
+
+
+# Flattening rules. Each returns a getter(key, message) -> column value.
+
+def field(name):
+    return lambda key, message: getattr(message, name)
+
+
+def address_field(name):
+    return lambda key, message: encode_address(getattr(message, name))
+
+
+def address_list_field(name):
+    return lambda key, message: ','.join(encode_address(raw) for raw in getattr(message, name))
+
+
+def json_map_field(name):
+    return lambda key, message: json.dumps({str(k): v for k, v in getattr(message, name).items()},
+                                           sort_keys=True)
+
+
+def text_field(name):
+    return lambda key, message: getattr(message, name).decode('utf-8', 'replace')
+
+
+def key_address(key, message):
+    return encode_key(key)
+
+
+class ColumnFamilySpec:
+    """How to decode and flatten the records of one column family.
+
+    columns is a list of (name, type, getter) tuples, with types as in
+    output_sinks. When slim_fields is given, only those singular scalar
+    fields are decoded (see tron_wire) instead of the full message.
+    """
+
+    def __init__(self, cf_name, table, message_type, columns, slim_fields=None):
+        self.cf_name = cf_name
+        self.table = table
+        self.message_type = message_type
+        self.columns = columns
+        if slim_fields:
+            self.decoder = slim_message_class(message_type, tuple(slim_fields))
+        else:
+            self.decoder = message_type
+
+    def sink_columns(self):
+        return [(name, kind) for name, kind, _ in self.columns]
+
+    def flatten(self, key, value):
+        message = self.decoder.FromString(value)
+        return tuple(getter(key, message) for _, _, getter in self.columns)
+
+
+EXCHANGE_COLUMNS = [
+    ('exchange_id', 'integer', field('exchange_id')),
+    ('creator_address', 'text', address_field('creator_address')),
+    ('create_time', 'integer', field('create_time')),
+    ('first_token_id', 'text', text_field('first_token_id')),
+    ('first_token_balance', 'integer', field('first_token_balance')),
+    ('second_token_id', 'text', text_field('second_token_id')),
+    ('second_token_balance', 'integer', field('second_token_balance')),
+]
+
+REGISTRY = {spec.cf_name: spec for spec in (
+    ColumnFamilySpec('account', 'account_details', Account, [
+        ('address', 'text', key_address),
+        ('balance_sun', 'integer', field('balance')),
+        ('create_time', 'integer', field('create_time')),
+        ('account_name', 'text', text_field('account_name')),
+        ('is_witness', 'bool', field('is_witness')),
+    ], slim_fields=('balance', 'create_time', 'account_name', 'is_witness')),
+    ColumnFamilySpec('witness', 'witnesses', Witness, [
+        ('address', 'text', address_field('address')),
+        ('vote_count', 'integer', field('voteCount')),
+        ('url', 'text', field('url')),
+        ('total_produced', 'integer', field('totalProduced')),
+        ('total_missed', 'integer', field('totalMissed')),
+        ('latest_block_num', 'integer', field('latestBlockNum')),
+        ('latest_slot_num', 'integer', field('latestSlotNum')),
+        ('is_jobs', 'bool', field('isJobs')),
+    ]),
+    ColumnFamilySpec('DelegatedResource', 'delegated_resources', DelegatedResource, [
+        ('from_address', 'text', address_field('from')),
+        ('to_address', 'text', address_field('to')),
+        ('frozen_balance_for_bandwidth', 'integer', field('frozen_balance_for_bandwidth')),
+        ('frozen_balance_for_energy', 'integer', field('frozen_balance_for_energy')),
+        ('expire_time_for_bandwidth', 'integer', field('expire_time_for_bandwidth')),
+        ('expire_time_for_energy', 'integer', field('expire_time_for_energy')),
+    ]),
+    ColumnFamilySpec('DelegatedResourceAccountIndex', 'delegated_resource_account_index',
+                     DelegatedResourceAccountIndex, [
+        ('account', 'text', address_field('account')),
+        ('from_accounts', 'text', address_list_field('fromAccounts')),
+        ('to_accounts', 'text', address_list_field('toAccounts')),
+        ('timestamp', 'integer', field('timestamp')),
+    ]),
+    ColumnFamilySpec('exchange', 'exchanges_v1', Exchange, EXCHANGE_COLUMNS),
+    ColumnFamilySpec('exchange-v2', 'exchanges', Exchange, EXCHANGE_COLUMNS),
+    ColumnFamilySpec('proposal', 'proposals', Proposal, [
+        ('proposal_id', 'integer', field('proposal_id')),
+        ('proposer_address', 'text', address_field('proposer_address')),
+        ('parameters', 'text', json_map_field('parameters')),
+        ('expiration_time', 'integer', field('expiration_time')),
+        ('create_time', 'integer', field('create_time')),
+        ('approvals', 'text', address_list_field('approvals')),
+        ('state', 'text', lambda key, message: Proposal.State.Name(message.state)),
+    ]),
+)}
+
+
+def extract(db, specs, sink_factory, batch_size=10000, read_opt=None):
+    """Exports each spec's column family from db through one sink per spec.
+
+    sink_factory(spec) must return an open output sink; read_opt is passed
+    to the column family iterators. Returns a dict of
+    cf_name -> (processed, exported, failed) counts.
+    """
+    stats = {}
+    for spec in specs:
+        cf = db.get_column_family(spec.cf_name)
+        sink = sink_factory(spec)
+        processed = exported = failed = 0
+        rows = []
+        for key, value in cf.items(read_opt=read_opt):
+            processed += 1
+            try:
+                rows.append(spec.flatten(key, value))
+            except Exception:
+                failed += 1
+                continue
+            if len(rows) >= batch_size:
+                sink.write_rows(rows)
+                exported += len(rows)
+                rows = []
+        sink.write_rows(rows)
+        exported += len(rows)
+        sink.close()
+        stats[spec.cf_name] = (processed, exported, failed)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export several column families of a Tron RocksDB database.')
+    parser.add_argument('db_path', type=str, help='Path to the Tron RocksDB database directory.')
+    parser.add_argument('--cf', action='append', choices=sorted(REGISTRY),
+                        help='Column family to export; repeat for several. Defaults to all that exist.')
+    parser.add_argument('--format', type=str, choices=FORMATS, default='sqlite', help='Output format.')
+    parser.add_argument('--db-file', type=str, default='tron_extract.db', help='SQLite database file for --format sqlite.')
+    parser.add_argument('--output-dir', type=str, default='.', help='Directory for the per-column-family files of the other formats.')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Number of rows written per output batch.')
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+    scan_settings = settings_from_args(args)
+
+    try:
+        cf_names = rocksdict.Rdict.list_cf(args.db_path)
+        db = open_for_scan(args.db_path, scan_settings)
+    except Exception as e:
+        print(f"Error opening RocksDB database: {e}")
+        return
+
+    wanted = args.cf or sorted(REGISTRY)
+    missing = [name for name in wanted if name not in cf_names]
+    if args.cf and missing:
+        print(f"Error: column families not found: {missing}")
+        print(f"Available column families: {cf_names}")
+        db.close()
+        return
+    specs = [REGISTRY[name] for name in wanted if name in cf_names]
+
+    def sink_factory(spec):
+        if args.format == 'sqlite':
+            path = args.db_file
+        else:
+            extension = os.path.splitext(DEFAULT_OUTPUTS[args.format])[1]
+            path = os.path.join(args.output_dir, spec.table + extension)
+        print(f"Exporting '{spec.cf_name}' to {path}" + (f" ({spec.table})" if args.format == 'sqlite' else ''))
+        return open_table_sink(args.format, path, spec.table, spec.sink_columns(), args.batch_size)
+
+    start = time.monotonic()
+    try:
+        stats = extract(db, specs, sink_factory, args.batch_size, scan_read_options(scan_settings))
+    finally:
+        db.close()
+
+    for cf_name, (processed, exported, failed) in stats.items():
+        print(f"{cf_name}: processed {processed}, exported {exported}, failed {failed}")
+    print(f"Done in {time.monotonic() - start:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Progress, throughput and per-stage metrics for long exports.
+
+ExportMetrics counts processed, skipped, failed and exported records,
+keeps the first decode errors with their keys, and estimates throughput
+and time remaining against RocksDB's rocksdb.estimate-num-keys property.
+Per-stage times come from the export pipeline's busy time per stage, or
+are timed per write batch.
+
+The current state is printed as a progress line and can also be written
+to a JSON file and/or a Prometheus textfile-collector file, both replaced
+atomically at every report.
+"""
+
+import json
+import os
+import sys
+import time
+
+ESTIMATE_PROPERTY = 'rocksdb.estimate-num-keys'
+
+
+def estimate_num_keys(cf):
+    """Returns RocksDB's estimate of the number of keys in cf, or None."""
+    try:
+        return cf.property_int_value(ESTIMATE_PROPERTY)
+    except Exception:
+        return None
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def _write_atomic(path, text):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ExportMetrics:
+    """Counters, stage timers and progress reporting for one export."""
+
+    def __init__(self, total_estimate=None, metrics_file=None, prometheus_file=None,
+                 report_every=100000, max_errors=20):
+        self.total_estimate = total_estimate
+        self.metrics_file = metrics_file
+        self.prometheus_file = prometheus_file
+        self.report_every = report_every
+        self.max_errors = max_errors
+        self.start = time.monotonic()
+        self.next_report = report_every
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.exported = 0
+        # Stages timed on every call.
+        self.stage_seconds = {'write': 0.0}
+        self.errors = []
+        self.done = False
+        # An export_pipeline.ExportPipeline, when the export runs as one.
+        self.pipeline = None
+
+    def record_failure(self, key, exc):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'key': bytes(key).hex(), 'error': f"{type(exc).__name__}: {exc}"})
+
+    def add(self, processed=0, skipped=0, failed=0, exported=0, errors=()):
+        """Adds counts reported by a worker process."""
+        self.processed += processed
+        self.skipped += skipped
+        self.failed += failed
+        self.exported += exported
+        for error in errors:
+            if len(self.errors) >= self.max_errors:
+                break
+            self.errors.append(error)
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self):
+        """Estimated seconds left, or None without a key count estimate."""
+        rate = self.rate()
+        if not self.total_estimate or not rate:
+            return None
+        return max(self.total_estimate - self.processed, 0) / rate
+
+    def stage_estimates(self):
+        """Returns estimated total seconds per stage, including iteration/other.
+
+        For a pipelined export, the busy seconds of each pipeline stage.
+        """
+        if self.pipeline is not None:
+            return dict(self.pipeline.busy)
+        stages = dict(self.stage_seconds)
+        stages['iterate/other'] = max(self.elapsed() - sum(stages.values()), 0.0)
+        return stages
+
+    def snapshot(self):
+        snapshot = {
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'exported': self.exported,
+            'estimated_total': self.total_estimate,
+            'elapsed_seconds': round(self.elapsed(), 3),
+            'rate_per_second': round(self.rate(), 1),
+            'eta_seconds': None if self.eta_seconds() is None else round(self.eta_seconds(), 1),
+            'stage_seconds': {name: round(seconds, 3) for name, seconds in self.stage_estimates().items()},
+            'errors': self.errors,
+            'done': self.done,
+        }
+        if self.pipeline is not None:
+            snapshot['queues'] = self.pipeline.queue_stats()
+        return snapshot
+
+    def maybe_report(self):
+        if self.processed >= self.next_report:
+            self.next_report = (self.processed // self.report_every + 1) * self.report_every
+            self.report()
+
+    def report(self):
+        line = f"\rProcessed {self.processed}"
+        if self.total_estimate:
+            percent = min(100.0, 100.0 * self.processed / self.total_estimate)
+            line += f" of ~{self.total_estimate} ({percent:.1f}%)"
+        line += f" accounts ({self.rate():,.0f}/s"
+        eta = self.eta_seconds()
+        if eta is not None and not self.done:
+            line += f", ETA {format_duration(eta)}"
+        if self.failed:
+            line += f", {self.failed} failed"
+        if self.pipeline is not None and not self.done:
+            line += f", queues {self.pipeline.depth_text()}"
+        sys.stdout.write(line + ")...")
+        sys.stdout.flush()
+        self.write_files()
+
+    def finish(self):
+        self.done = True
+        self.write_files()
+
+    def summary_lines(self):
+        lines = [f"Records: {self.processed} processed, {self.exported} exported, "
+                 f"{self.skipped} below minimum balance, {self.failed} failed."]
+        if self.pipeline is not None:
+            # Stages overlap, so their times are shown as busy shares of the run.
+            lines += self.pipeline.summary_lines(self.elapsed())
+        else:
+            stages = self.stage_estimates()
+            total = sum(stages.values()) or 1.0
+            lines.append("Stages: " + ", ".join(f"{name} {seconds:.1f}s ({100 * seconds / total:.0f}%)"
+                                                for name, seconds in stages.items()))
+        for error in self.errors[:5]:
+            lines.append(f"Failed key {error['key']}: {error['error']}")
+        return lines
+
+    def write_files(self):
+        if self.metrics_file:
+            _write_atomic(self.metrics_file, json.dumps(self.snapshot(), indent=2) + '\n')
+        if self.prometheus_file:
+            _write_atomic(self.prometheus_file, self.prometheus_text())
+
+    def prometheus_text(self):
+        lines = [
+            '# HELP tron_export_records_total Account records by outcome.',
+            '# TYPE tron_export_records_total counter',
+        ]
+        for status in ('processed', 'skipped', 'failed', 'exported'):
+            lines.append(f'tron_export_records_total{{status="{status}"}} {getattr(self, status)}')
+        lines += [
+            '# HELP tron_export_stage_seconds Estimated time spent per pipeline stage.',
+            '# TYPE tron_export_stage_seconds gauge',
+        ]
+        for name, seconds in self.stage_estimates().items():
+            lines.append(f'tron_export_stage_seconds{{stage="{name}"}} {seconds:.3f}')
+        if self.pipeline is not None:
+            queues = self.pipeline.queue_stats()
+            for name, key, help_text in (
+                    ('tron_export_queue_batches', 'batches', 'Batches waiting in each pipeline queue.'),
+                    ('tron_export_queue_bytes', 'bytes', 'Estimated bytes waiting in each pipeline queue.'),
+                    ('tron_export_queue_max_bytes', 'max_bytes', 'Byte limit of each pipeline queue.')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+                for queue_name, stats in queues.items():
+                    lines.append(f'{name}{{queue="{queue_name}"}} {stats[key]}')
+        gauges = [
+            ('tron_export_rate_per_second', 'Records processed per second.', self.rate()),
+            ('tron_export_estimated_total', 'RocksDB estimate of the number of records.', self.total_estimate),
+            ('tron_export_eta_seconds', 'Estimated seconds until the scan finishes.', self.eta_seconds()),
+            ('tron_export_done', '1 once the export has finished.', int(self.done)),
+        ]
+        for name, help_text, value in gauges:
+            if value is None:
+                continue
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value:g}']
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,337 @@
+"""Staged, memory-bounded account export pipeline.
+
+The export runs as four stages connected by bounded queues:
+
+    reader -> raw -> decoder -> decoded -> filter -> rows -> writer
+
+reader      iterates the account column family into batches of (key, value)
+decoder     reads the balance of each record (tron_wire or a full parse)
+filter      drops accounts below the minimum balance and encodes addresses
+writer      hands the rows to the output sink
+
+The reader, decoder and filter stages run in threads of their own and the
+writer in the calling thread, so RocksDB reads, decoding and SQLite or
+file writes overlap. The decoder can also fan batches out to worker
+processes; the batches in flight there are charged to a share of the
+memory ceiling of their own. Each queue holds at most its share of the
+memory ceiling in (estimated) bytes, so a stage that runs ahead blocks
+instead of growing memory. The busy time of each stage and the depth of each queue show
+which stage limits throughput: the busiest stage is the bottleneck, and
+the queue in front of it is the one that stays full.
+"""
+
+import collections
+import multiprocessing
+import threading
+import time
+
+from address_codec import encode_address
+from core.Tron_pb2 import Account
+from tron_wire import decode_account_balance
+
+QUEUES = ('raw', 'decoded', 'rows')
+STAGES = ('reader', 'decoder', 'filter', 'writer')
+# Rough per-item cost of the Python tuple and objects around the payload.
+ITEM_OVERHEAD = 120
+
+
+class PipelineAborted(Exception):
+    """Raised in a stage when another stage has failed."""
+
+
+class BoundedQueue:
+    """A FIFO of batches bounded by total estimated bytes.
+
+    put() blocks while the queue holds max_bytes or more; one batch is
+    always accepted into an empty queue, so an oversized batch cannot
+    stall the pipeline.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.items = collections.deque()
+        self.bytes = 0
+        self.closed = False
+        self.aborted = False
+        self.cond = threading.Condition()
+        self.high_water = 0
+        self.depth_sum = 0
+        self.puts = 0
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+
+    def put(self, batch, nbytes):
+        with self.cond:
+            t = time.perf_counter()
+            while self.items and self.bytes + nbytes > self.max_bytes and not self.aborted:
+                self.cond.wait()
+            self.put_wait += time.perf_counter() - t
+            if self.aborted:
+                raise PipelineAborted()
+            self.items.append((batch, nbytes))
+            self.bytes += nbytes
+            self.high_water = max(self.high_water, self.bytes)
+            self.depth_sum += len(self.items)
+            self.puts += 1
+            self.cond.notify_all()
+
+    def get(self):
+        """Returns the next batch, or None once the queue is closed and empty."""
+        item = self.get_item()
+        return None if item is None else item[0]
+
+    def get_item(self):
+        """Like get(), but returns (batch, nbytes)."""
+        with self.cond:
+            t = time.perf_counter()
+            while not self.items and not self.closed and not self.aborted:
+                self.cond.wait()
+            self.get_wait += time.perf_counter() - t
+            if self.aborted:
+                raise PipelineAborted()
+            if not self.items:
+                return None
+            batch, nbytes = self.items.popleft()
+            self.bytes -= nbytes
+            self.cond.notify_all()
+            return batch, nbytes
+
+    def close(self):
+        """Marks the end of the input; get() returns None once drained."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def abort(self):
+        with self.cond:
+            self.aborted = True
+            self.cond.notify_all()
+
+    def stats(self):
+        return {
+            'batches': len(self.items),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'high_water_bytes': self.high_water,
+            'mean_depth': round(self.depth_sum / self.puts, 2) if self.puts else 0.0,
+            'put_wait_seconds': round(self.put_wait, 3),
+            'get_wait_seconds': round(self.get_wait, 3),
+        }
+
+
+def decode_batch(batch, full_parse=False):
+    """Decoder stage work: returns ([(key, balance_sun)], [(key, error)])."""
+    decoded = []
+    failures = []
+    for key, value in batch:
+        try:
+            if full_parse:
+                balance_sun = Account.FromString(value).balance
+            else:
+                balance_sun = decode_account_balance(value)
+        except Exception as e:
+            failures.append((bytes(key), e))
+            continue
+        decoded.append((key, balance_sun))
+    return decoded, failures
+
+
+class ExportPipeline:
+    """Runs the reader, decoder, filter and writer stages for one export.
+
+    items is the (key, value) iterator of the account column family and
+    write_rows the sink's write function. memory_mb is split evenly
+    between the three queues. With processes > 0 the decoder stage sends
+    batches to that many worker processes, and the batches in flight there
+    get an equal share of memory_mb of their own. metrics (an ExportMetrics) is
+    updated as batches pass through and is reported from the calling
+    thread.
+    """
+
+    def __init__(self, items, write_rows, metrics, min_balance=0, batch_size=10000, full_parse=False,
+                 memory_mb=256, processes=0):
+        self.items = items
+        self.write_rows = write_rows
+        self.metrics = metrics
+        self.min_balance = min_balance
+        self.batch_size = batch_size
+        self.full_parse = full_parse
+        self.processes = processes
+        shares = len(QUEUES) + (1 if processes > 0 else 0)
+        per_queue = max(int(memory_mb * (1 << 20)) // shares, 1)
+        self.queues = {name: BoundedQueue(name, per_queue) for name in QUEUES}
+        # Cut batches so that two fit in a queue's share of the memory ceiling
+        # and, with worker processes, one per process fits in the in-flight
+        # share, counting the pickled copy on each side of the pool.
+        self.max_batch_bytes = per_queue // 2
+        if processes > 0:
+            self.max_batch_bytes = min(self.max_batch_bytes, per_queue // (2 * processes))
+        self.in_flight = {'batches': 0, 'bytes': 0, 'max_bytes': per_queue, 'high_water_bytes': 0}
+        self.busy = {name: 0.0 for name in STAGES}
+        self.error = None
+        metrics.pipeline = self
+
+    def reader(self):
+        out = self.queues['raw']
+        batch = []
+        nbytes = 0
+        t = time.perf_counter()
+        for key, value in self.items:
+            batch.append((key, value))
+            nbytes += len(key) + len(value) + ITEM_OVERHEAD
+            if len(batch) >= self.batch_size or nbytes >= self.max_batch_bytes:
+                self.busy['reader'] += time.perf_counter() - t
+                out.put(batch, nbytes)
+                t = time.perf_counter()
+                batch = []
+                nbytes = 0
+        self.busy['reader'] += time.perf_counter() - t
+        if batch:
+            out.put(batch, nbytes)
+        out.close()
+
+    def decoder(self):
+        inp, out = self.queues['raw'], self.queues['decoded']
+        if self.processes > 0:
+            self._decode_in_processes(inp, out)
+        else:
+            while True:
+                batch = inp.get()
+                if batch is None:
+                    break
+                t = time.perf_counter()
+                result = decode_batch(batch, self.full_parse)
+                self.busy['decoder'] += time.perf_counter() - t
+                self._put_decoded(out, len(batch), result)
+        out.close()
+
+    def _decode_in_processes(self, inp, out):
+        ctx = multiprocessing.get_context('spawn')
+        in_flight = self.in_flight
+        with ctx.Pool(self.processes) as pool:
+            # Window of batches in flight in the worker processes, bounded by
+            # their bytes: each is held pickled in the pool's task queue and
+            # again in a worker.
+            pending = collections.deque()
+            while True:
+                item = inp.get_item()
+                if item is None:
+                    break
+                batch, nbytes = item
+                cost = nbytes * 2
+                while pending and in_flight['bytes'] + cost > in_flight['max_bytes']:
+                    self._collect(out, pending.popleft())
+                pending.append((len(batch), cost, pool.apply_async(decode_batch, (batch, self.full_parse))))
+                in_flight['batches'] += 1
+                in_flight['bytes'] += cost
+                in_flight['high_water_bytes'] = max(in_flight['high_water_bytes'], in_flight['bytes'])
+            while pending:
+                self._collect(out, pending.popleft())
+
+    def _collect(self, out, entry):
+        count, cost, result = entry
+        t = time.perf_counter()
+        decoded = result.get()
+        # Time spent waiting on the workers counts as decoder time.
+        self.busy['decoder'] += time.perf_counter() - t
+        self.in_flight['batches'] -= 1
+        self.in_flight['bytes'] -= cost
+        self._put_decoded(out, count, decoded)
+
+    def _put_decoded(self, out, count, result):
+        decoded, failures = result
+        self.metrics.processed += count
+        for key, e in failures:
+            self.metrics.record_failure(key, e)
+        out.put(decoded, len(decoded) * ITEM_OVERHEAD)
+
+    def filter(self):
+        inp, out = self.queues['decoded'], self.queues['rows']
+        min_balance = self.min_balance
+        while True:
+            batch = inp.get()
+            if batch is None:
+                break
+            t = time.perf_counter()
+            # Same test as read_tron_db.decode_account.
+            rows = [(encode_address(key), balance_sun) for key, balance_sun in batch
+                    if balance_sun / 1_000_000 >= min_balance]
+            self.metrics.skipped += len(batch) - len(rows)
+            self.busy['filter'] += time.perf_counter() - t
+            out.put(rows, len(rows) * (ITEM_OVERHEAD + 34))
+        out.close()
+
+    def writer(self):
+        inp = self.queues['rows']
+        while True:
+            rows = inp.get()
+            if rows is None:
+                break
+            t = time.perf_counter()
+            self.write_rows(rows)
+            self.busy['writer'] += time.perf_counter() - t
+            self.metrics.exported += len(rows)
+            self.metrics.maybe_report()
+
+    def _run_stage(self, name):
+        try:
+            getattr(self, name)()
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _fail(self, e):
+        if self.error is None:
+            self.error = e
+        for q in self.queues.values():
+            q.abort()
+
+    def run(self):
+        """Runs all stages to completion and re-raises the first stage error.
+
+        The writer stage runs in the calling thread, which created the sink
+        (sqlite3 connections are bound to their thread) and also reports
+        progress; the other stages run in threads of their own.
+        """
+        threads = [threading.Thread(target=self._run_stage, args=(name,), name=f'export-{name}', daemon=True)
+                   for name in STAGES if name != 'writer']
+        for thread in threads:
+            thread.start()
+        try:
+            self.writer()
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def queue_stats(self):
+        """Stats of each queue, and of the batches in flight in worker processes."""
+        stats = {name: q.stats() for name, q in self.queues.items()}
+        if self.processes > 0:
+            stats['in_flight'] = dict(self.in_flight)
+        return stats
+
+    def depth_text(self):
+        """Short 'raw 3/12MB ...' text of the current queue fill."""
+        return ' '.join(f"{name} {stats['bytes'] / (1 << 20):.0f}/{stats['max_bytes'] / (1 << 20):.0f}MB"
+                        for name, stats in self.queue_stats().items())
+
+    def summary_lines(self, elapsed):
+        elapsed = elapsed or 1e-9
+        lines = ["Pipeline: " + ", ".join(f"{name} busy {100 * seconds / elapsed:.0f}%"
+                                           for name, seconds in self.busy.items())]
+        lines.append("Queues: " + ", ".join(
+            f"{name} mean depth {stats['mean_depth']} batches, peak {stats['high_water_bytes'] / (1 << 20):.1f}MB"
+            for name, stats in self.queue_stats().items() if name in self.queues))
+        if self.processes > 0:
+            lines.append(f"In flight in worker processes: peak {self.in_flight['high_water_bytes'] / (1 << 20):.1f}MB "
+                         f"of {self.in_flight['max_bytes'] / (1 << 20):.1f}MB.")
+        bottleneck = max(self.busy, key=self.busy.get)
+        lines.append(f"Bottleneck: {bottleneck} stage.")
+        return lines
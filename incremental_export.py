@@ -0,0 +1,207 @@
+"""Incremental (delta) export of account balances into the SQLite output.
+
+A full export decodes and rewrites every account, although only a small
+fraction of accounts change between two daily copies of the node's
+database. For an incremental export a fingerprint of every account value is
+kept in the output database, in the account_state table keyed by the raw
+address bytes. SQLite compares BLOB keys with memcmp, the same order as
+RocksDB's default bytewise comparator, so the stored fingerprints can be
+merge-joined against the account column family iterator in a single
+sequential pass with constant memory. Only added or changed records are
+decoded, and accounts that disappeared are deleted.
+"""
+
+import hashlib
+import sqlite3
+
+from address_codec import encode_address
+from output_sinks import sqlite_rows
+
+ADDED = 'added'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+REMOVED = 'removed'
+
+
+def fingerprint(value):
+    """Returns a 64-bit fingerprint of an account value, as a signed integer."""
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'little', signed=True)
+
+
+def setup_state(conn):
+    """Creates the fingerprint and metadata tables used by incremental exports."""
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS account_state (
+            key BLOB PRIMARY KEY,
+            fp INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS export_meta (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    conn.commit()
+
+
+def get_meta(conn, name):
+    row = conn.execute("SELECT value FROM export_meta WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(conn, name, value):
+    conn.execute("INSERT OR REPLACE INTO export_meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+
+def merge_changes(items, old_state):
+    """Merge-joins current (key, value) items with stored (key, fp) state.
+
+    Both inputs must be sorted by key. Yields (status, key, value, fp) where
+    status is ADDED, CHANGED, UNCHANGED or REMOVED; value and fp are None
+    for removed keys.
+    """
+    old = next(old_state, None)
+    for key, value in items:
+        while old is not None and old[0] < key:
+            yield REMOVED, old[0], None, None
+            old = next(old_state, None)
+        fp = fingerprint(value)
+        if old is not None and old[0] == key:
+            status = UNCHANGED if old[1] == fp else CHANGED
+            old = next(old_state, None)
+        else:
+            status = ADDED
+        yield status, key, value, fp
+    while old is not None:
+        yield REMOVED, old[0], None, None
+        old = next(old_state, None)
+
+
+class DeltaWriter:
+    """Buffers account and fingerprint changes and writes them in batches."""
+
+    def __init__(self, conn, batch_size):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.upserts = []
+        self.deletes = []
+        self.state_upserts = []
+        self.state_deletes = []
+
+    def pending(self):
+        return len(self.upserts) + len(self.deletes) + len(self.state_upserts) + len(self.state_deletes)
+
+    def flush(self):
+        if not self.pending():
+            return
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO accounts (address, trx_balance, balance_sun) "
+                                  "VALUES (?, ?, ?)", sqlite_rows(self.upserts))
+            self.conn.executemany("DELETE FROM accounts WHERE address = ?", self.deletes)
+            self.conn.executemany("INSERT OR REPLACE INTO account_state (key, fp) VALUES (?, ?)",
+                                  self.state_upserts)
+            self.conn.executemany("DELETE FROM account_state WHERE key = ?", self.state_deletes)
+        self.upserts.clear()
+        self.deletes.clear()
+        self.state_upserts.clear()
+        self.state_deletes.clear()
+
+
+def export_incremental(account_cf, db_file, decode, min_balance, batch_size,
+                       sequence=None, progress=None, read_opt=None, record_failure=None, source=None):
+    """Brings the accounts table in db_file up to date with account_cf.
+
+    decode(key, value, min_balance) must return an (address, balance_sun)
+    row or None, as read_tron_db.decode_account does. sequence is the
+    RocksDB sequence number of the source and source a string that
+    identifies it (rocks_open.database_identity); when both match the
+    previous run nothing is scanned. progress, if given, is called with the number
+    of records processed every 100000 records. read_opt is passed to the
+    column family iterator. record_failure, if given, is called with the
+    key and exception of every record that fails to decode; such records
+    keep no fingerprint, so the next run tries them again.
+
+    Returns a dict with the delta counts.
+    """
+    counts = {ADDED: 0, CHANGED: 0, UNCHANGED: 0, REMOVED: 0, 'exported': 0, 'failed': 0}
+
+    writer_conn = sqlite3.connect(db_file)
+    setup_state(writer_conn)
+
+    previous_min_balance = get_meta(writer_conn, 'min_balance')
+    if previous_min_balance is not None and float(previous_min_balance) != min_balance:
+        # The filter changed, so stored fingerprints say nothing about which
+        # rows belong in the accounts table: start over.
+        print(f"Minimum balance changed from {previous_min_balance} to {min_balance}; rebuilding.")
+        with writer_conn:
+            writer_conn.execute("DELETE FROM account_state")
+            writer_conn.execute("DELETE FROM accounts")
+            writer_conn.execute("DELETE FROM export_meta")
+    elif writer_conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM account_state LIMIT 1)").fetchone()[0] == 0:
+        # No fingerprints: a first incremental run, possibly over the table of
+        # a full export. Every record is ADDED, so rows the merge would not
+        # produce must not stay behind.
+        with writer_conn:
+            writer_conn.execute("DELETE FROM accounts")
+            writer_conn.execute("DELETE FROM export_meta")
+    elif sequence is not None and get_meta(writer_conn, 'sequence') == str(sequence) and \
+            get_meta(writer_conn, 'source') == str(source):
+        print(f"Source database unchanged since last export (sequence {sequence}).")
+        counts[UNCHANGED] = writer_conn.execute("SELECT COUNT(*) FROM account_state").fetchone()[0]
+        writer_conn.close()
+        return counts
+
+    # The old state is read through a second connection. In WAL mode its
+    # read transaction keeps seeing the old snapshot while the writer
+    # connection commits batches of changes.
+    reader_conn = sqlite3.connect(db_file)
+    old_state = reader_conn.execute("SELECT key, fp FROM account_state ORDER BY key")
+
+    writer = DeltaWriter(writer_conn, batch_size)
+    processed = 0
+    for status, key, value, fp in merge_changes(account_cf.items(read_opt=read_opt), old_state):
+        counts[status] += 1
+        if status == REMOVED:
+            writer.deletes.append((encode_address(key),))
+            writer.state_deletes.append((key,))
+        else:
+            processed += 1
+            if progress is not None and processed % 100000 == 0:
+                progress(processed)
+            if status == UNCHANGED:
+                continue
+            try:
+                row = decode(key, value, min_balance)
+            except Exception as e:
+                counts['failed'] += 1
+                if record_failure is not None:
+                    record_failure(key, e)
+                # Keep the last good row, but forget the fingerprint so the
+                # record is retried (as ADDED) on the next run.
+                if status == CHANGED:
+                    writer.state_deletes.append((key,))
+            else:
+                if row is not None:
+                    writer.upserts.append(row)
+                    counts['exported'] += 1
+                elif status == CHANGED:
+                    writer.deletes.append((encode_address(key),))
+                writer.state_upserts.append((key, fp))
+        if writer.pending() >= batch_size:
+            writer.flush()
+
+    old_state.close()
+    reader_conn.close()
+    writer.flush()
+    with writer_conn:
+        set_meta(writer_conn, 'min_balance', min_balance)
+        # With failed records, the next run must scan again to retry them.
+        if sequence is not None and not counts['failed']:
+            set_meta(writer_conn, 'sequence', sequence)
+            set_meta(writer_conn, 'source', source)
+        elif counts['failed']:
+            writer_conn.execute("DELETE FROM export_meta WHERE name = 'sequence'")
+    writer_conn.close()
+    return counts
@@ -0,0 +1,193 @@
+"""Generate a synthetic Tron RocksDB database for tests and benchmarks.
+
+The database gets an `account` column family with N core.Tron_pb2.Account
+records keyed by random 21-byte mainnet addresses. Balances follow a
+heavy-tailed distribution with a share of empty accounts, and every
+account carries a configurable number of TRC10 asset/assetV2 entries and
+votes, the fields that dominate the cost of a full protobuf parse.
+With --blocks, a `block` column family of blocks with TRX, TRC10 and
+TRC20 transfers is written as well, for block_scanner.py.
+
+    python make_fixture.py /tmp/tron_fixture --accounts 1000000 --assets 20 --votes 3
+    python make_fixture.py /tmp/tron_blocks --accounts 1000 --blocks 100000
+"""
+
+import argparse
+import os
+import random
+import time
+
+import rocksdict
+
+from core.Tron_pb2 import Account, Block, Transaction
+from tron_wire import TransferAssetContract, TransferContract, TriggerSmartContract
+
+ADDRESS_PREFIX = b'\x41'
+TYPE_URL_PREFIX = 'type.googleapis.com/protocol.'
+
+
+def random_address(rng):
+    return ADDRESS_PREFIX + rng.getrandbits(160).to_bytes(20, 'big')
+
+
+def make_account(rng, address, assets, votes, witnesses):
+    """Builds one Account with roughly realistic field values."""
+    account = Account()
+    account.address = address
+    account.type = 0
+    if rng.random() < 0.3:
+        account.balance = 0
+    else:
+        # Log-uniform between 1 sun and 100M TRX.
+        account.balance = int(10 ** rng.uniform(0, 14))
+    account.create_time = rng.randint(1_529_891_469_000, 1_750_000_000_000)
+    account.latest_opration_time = account.create_time + rng.randint(0, 10 ** 10)
+    account.net_usage = rng.randint(0, 5000)
+    account.free_net_usage = rng.randint(0, 1500)
+    for _ in range(assets):
+        token_id = str(1_000_000 + rng.randint(0, 50_000))
+        account.assetV2[token_id] = rng.randint(0, 10 ** 12)
+        account.asset[f'TOKEN{token_id}'] = rng.randint(0, 10 ** 12)
+        account.latest_asset_operation_timeV2[token_id] = account.latest_opration_time
+    for _ in range(votes):
+        vote = account.votes.add()
+        vote.vote_address = rng.choice(witnesses)
+        vote.vote_count = rng.randint(1, 10 ** 6)
+    if votes:
+        frozen = account.frozenV2.add()
+        frozen.type = 0
+        frozen.amount = rng.randint(1, 10 ** 12)
+    account.account_resource.energy_usage = rng.randint(0, 10 ** 6)
+    account.account_resource.latest_consume_time_for_energy = account.latest_opration_time
+    return account
+
+
+def add_contract(tx, contract_type, message):
+    contract = tx.raw_data.contract.add()
+    contract.type = Transaction.Contract.ContractType.Value(contract_type)
+    contract.parameter.type_url = TYPE_URL_PREFIX + contract_type
+    contract.parameter.value = message.SerializeToString()
+    tx.ret.add().contractRet = Transaction.Result.contractResult.Value('SUCCESS')
+
+
+def make_block(rng, number, timestamp, accounts, tokens, transactions):
+    """Builds one Block of TRX, TRC10, TRC20 and non-transfer transactions."""
+    block = Block()
+    raw = block.block_header.raw_data
+    raw.number = number
+    raw.timestamp = timestamp
+    raw.parentHash = rng.getrandbits(256).to_bytes(32, 'big')
+    raw.witness_address = rng.choice(accounts)
+    for _ in range(transactions):
+        tx = block.transactions.add()
+        tx.raw_data.timestamp = timestamp
+        tx.raw_data.ref_block_bytes = rng.getrandbits(16).to_bytes(2, 'big')
+        owner, to = rng.choice(accounts), rng.choice(accounts)
+        kind = rng.random()
+        if kind < 0.4:
+            add_contract(tx, 'TransferContract', TransferContract(
+                owner_address=owner, to_address=to, amount=rng.randint(1, 10 ** 12)))
+        elif kind < 0.5:
+            add_contract(tx, 'TransferAssetContract', TransferAssetContract(
+                asset_name=str(1_000_000 + rng.randint(0, 5000)).encode(), owner_address=owner, to_address=to,
+                amount=rng.randint(1, 10 ** 9)))
+        elif kind < 0.9:
+            data = (bytes.fromhex('a9059cbb') + bytes(12) + to[1:] + rng.getrandbits(200).to_bytes(32, 'big'))
+            add_contract(tx, 'TriggerSmartContract', TriggerSmartContract(
+                owner_address=owner, contract_address=rng.choice(tokens), data=data))
+        else:
+            # A contract call that is not a token transfer.
+            add_contract(tx, 'TriggerSmartContract', TriggerSmartContract(
+                owner_address=owner, contract_address=rng.choice(tokens), data=rng.randbytes(36)))
+        tx.signature.append(rng.randbytes(65))
+    block.block_header.witness_signature = rng.randbytes(65)
+    return block
+
+
+def generate_blocks(db, options, rng, blocks, transactions, write_opt, batch_size=1000):
+    """Writes a block column family of N blocks keyed by java-tron block id (number + hash)."""
+    db.create_column_family('block', options)
+    block_cf = db.get_column_family_handle('block')
+    accounts = [random_address(rng) for _ in range(1000)]
+    tokens = [random_address(rng) for _ in range(20)]
+    timestamp = 1_529_891_469_000
+    batch = rocksdict.WriteBatch(raw_mode=True)
+    for number in range(1, blocks + 1):
+        timestamp += 3000
+        block = make_block(rng, number, timestamp, accounts, tokens, rng.randint(0, 2 * transactions))
+        batch.put(number.to_bytes(8, 'big') + rng.randbytes(24), block.SerializeToString(), block_cf)
+        if number % batch_size == 0:
+            db.write(batch, write_opt)
+            batch = rocksdict.WriteBatch(raw_mode=True)
+    if not batch.is_empty():
+        db.write(batch, write_opt)
+    db.get_column_family('block').flush()
+
+
+def generate(path, accounts, assets=0, votes=0, seed=1, batch_size=10000, progress=True,
+             blocks=0, transactions=20):
+    """Creates a database at path with an account column family of N accounts.
+
+    assets and votes are the mean number of asset-map entries and votes
+    per account; each account gets between 0 and twice the mean. With
+    blocks, a block column family is added too, with a mean of
+    transactions transactions per block.
+    """
+    rng = random.Random(seed)
+    witnesses = [random_address(rng) for _ in range(127)]
+
+    options = rocksdict.Options(raw_mode=True)
+    options.create_if_missing(True)
+    options.set_error_if_exists(True)
+    db = rocksdict.Rdict(path, options=options)
+    try:
+        db.create_column_family('account', options)
+        account_cf = db.get_column_family_handle('account')
+        write_opt = rocksdict.WriteOptions()
+        write_opt.disable_wal = True
+
+        batch = rocksdict.WriteBatch(raw_mode=True)
+        start = time.monotonic()
+        for i in range(1, accounts + 1):
+            address = random_address(rng)
+            account = make_account(rng, address, rng.randint(0, 2 * assets), rng.randint(0, 2 * votes),
+                                   witnesses)
+            batch.put(address, account.SerializeToString(), account_cf)
+            if i % batch_size == 0:
+                db.write(batch, write_opt)
+                batch = rocksdict.WriteBatch(raw_mode=True)
+                if progress and i % 100000 == 0:
+                    print(f"\rWrote {i} accounts ({i / (time.monotonic() - start):,.0f}/s)...", end='', flush=True)
+        if not batch.is_empty():
+            db.write(batch, write_opt)
+        # Writes skipped the WAL, so flush the memtable before closing.
+        db.get_column_family('account').flush()
+        if blocks:
+            generate_blocks(db, options, rng, blocks, transactions, write_opt)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Tron RocksDB database with an account column family.')
+    parser.add_argument('path', type=str, help='Directory of the database to create (must not exist).')
+    parser.add_argument('--accounts', type=int, default=100000, help='Number of accounts.')
+    parser.add_argument('--assets', type=int, default=5, help='Mean number of asset/assetV2 entries per account.')
+    parser.add_argument('--votes', type=int, default=1, help='Mean number of votes per account.')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed.')
+    parser.add_argument('--blocks', type=int, default=0, help='Number of blocks in a block column family (0 for none).')
+    parser.add_argument('--transactions', type=int, default=20, help='Mean number of transactions per block.')
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        print(f"Error: '{args.path}' already exists.")
+        return
+    start = time.monotonic()
+    generate(args.path, args.accounts, args.assets, args.votes, args.seed,
+             blocks=args.blocks, transactions=args.transactions)
+    print(f"\nDone. Wrote {args.accounts} accounts and {args.blocks} blocks to '{args.path}' "
+          f"in {time.monotonic() - start:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
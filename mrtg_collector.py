@@ -0,0 +1,207 @@
+"""Long-running line-count collector for the MRTG range targets.
+
+Every MRTG target used to run getlast.sh, which forks bash, cat and wc -l
+to count the lines of last[N].log on every poll, so each poll costs as
+much as the whole file. The collector keeps, per range, the file offset
+and line count it has already seen and on each query reads only the bytes
+appended since then. A file that shrank, was replaced (new inode) or was
+rewritten in place (the last bytes it counted differ, or the size is the
+same with a new mtime) is counted again from the start.
+
+It answers queries on a local socket with the same four lines as
+getlast.sh: the line count, 0, the range and the name.
+
+    python mrtg_collector.py --log-dir /home/ekrami serve
+    python mrtg_collector.py query 100 Servers
+
+The query client counts the file directly when the collector is not
+running, so a target never goes blank because the service is down.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import socketserver
+import sys
+
+DEFAULT_SOCKET = '/tmp/mrtg_collector.sock'
+DEFAULT_LOG_DIR = '/home/ekrami'
+LOG_NAME = 'last[{range}].log'
+BLOCK_SIZE = 1 << 20
+# Bytes before the offset that are checked on every poll to detect rewrites.
+TAIL_SIZE = 64
+
+
+def log_path(log_dir, range_id):
+    if not range_id.isdigit():
+        raise ValueError(f"Invalid range '{range_id}'")
+    return os.path.join(log_dir, LOG_NAME.format(range=range_id))
+
+
+def mrtg_lines(count, range_id, name):
+    """Returns the four-line MRTG target output of getlast.sh."""
+    return f"{count}\n0\n{range_id}\n{name}\n"
+
+
+class LineCounter:
+    """Running newline count of one append-only log file (wc -l semantics)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+
+    def reset(self, inode=None):
+        self.inode = inode
+        self.offset = 0
+        self.lines = 0
+        self.mtime_ns = None
+        self.tail = b''
+
+    def update(self):
+        """Counts the bytes appended since the last call. Returns the line count."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            # cat fails and wc -l prints 0.
+            self.reset()
+            return 0
+        with f:
+            st = os.fstat(f.fileno())
+            rewritten = st.st_size == self.offset and st.st_mtime_ns != self.mtime_ns
+            if not rewritten and self.tail and st.st_size >= self.offset:
+                # Truncated and written again, possibly longer (> redirection).
+                f.seek(self.offset - len(self.tail))
+                rewritten = f.read(len(self.tail)) != self.tail
+            if st.st_ino != self.inode or st.st_size < self.offset or rewritten:
+                self.reset(st.st_ino)
+            f.seek(self.offset)
+            # Stop at the size fstat saw, so mtime_ns matches what was read.
+            while self.offset < st.st_size:
+                block = f.read(min(BLOCK_SIZE, st.st_size - self.offset))
+                if not block:
+                    break
+                self.offset += len(block)
+                self.lines += block.count(b'\n')
+                self.tail = (self.tail + block)[-TAIL_SIZE:]
+            self.mtime_ns = st.st_mtime_ns
+        return self.lines
+
+
+class Collector:
+    """One LineCounter per range, created on the first query for it."""
+
+    def __init__(self, log_dir, ranges=None):
+        self.log_dir = log_dir
+        self.ranges = set(ranges) if ranges else None
+        self.counters = {}
+
+    def count(self, range_id):
+        if self.ranges is not None and range_id not in self.ranges:
+            raise ValueError(f"Unknown range '{range_id}'")
+        counter = self.counters.get(range_id)
+        if counter is None:
+            counter = self.counters[range_id] = LineCounter(log_path(self.log_dir, range_id))
+        return counter.update()
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """Reads one 'RANGE [NAME]' line and writes the four MRTG lines."""
+
+    def handle(self):
+        request = self.rfile.readline(1024).decode('utf-8', 'replace').strip()
+        range_id, _, name = request.partition(' ')
+        try:
+            count = self.server.collector.count(range_id)
+        except ValueError as e:
+            self.wfile.write(f"Error: {e}\n".encode('utf-8'))
+            return
+        self.wfile.write(mrtg_lines(count, range_id, name).encode('utf-8'))
+
+
+class UnixServer(socketserver.UnixStreamServer):
+    pass
+
+
+class TcpServer(socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+def serve(collector, socket_path=DEFAULT_SOCKET, port=None):
+    """Serves queries one at a time until interrupted."""
+    if port:
+        server = TcpServer(('127.0.0.1', port), QueryHandler)
+        where = f"127.0.0.1:{port}"
+    else:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixServer(socket_path, QueryHandler)
+        where = socket_path
+    server.collector = collector
+    # Leave through the finally block below on a service stop too.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving MRTG counts for '{collector.log_dir}' on {where}.", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not port and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def query(range_id, name, socket_path=DEFAULT_SOCKET, port=None, timeout=5.0):
+    """Asks the collector for a range. Returns its reply, or None if it is not running."""
+    try:
+        if port:
+            sock = socket.create_connection(('127.0.0.1', port), timeout=timeout)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+    except OSError:
+        return None
+    with sock:
+        sock.sendall(f"{range_id} {name}\n".encode('utf-8'))
+        chunks = []
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b''.join(chunks).decode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental line-count collector for the MRTG range targets.')
+    parser.add_argument('--socket', type=str, default=DEFAULT_SOCKET, help='Unix socket path.')
+    parser.add_argument('--port', type=int, help='Listen on / connect to this 127.0.0.1 TCP port instead of the Unix socket.')
+    parser.add_argument('--log-dir', type=str, default=DEFAULT_LOG_DIR, help='Directory of the last[N].log files.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_serve = sub.add_parser('serve', help='Run the collector.')
+    p_serve.add_argument('--ranges', nargs='+', help='Only answer these ranges (default: any).')
+
+    p_query = sub.add_parser('query', help='Print the four MRTG lines for a range (MRTG Target command).')
+    p_query.add_argument('range', type=str, help='Range number, e.g. 100.')
+    p_query.add_argument('name', nargs='*', help='Target name echoed on the fourth line.')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(Collector(args.log_dir, args.ranges), args.socket, args.port)
+        return
+
+    name = ' '.join(args.name)
+    reply = query(args.range, name, args.socket, args.port)
+    if reply is None:
+        # Collector not running: count the whole file, as getlast.sh does.
+        try:
+            reply = mrtg_lines(LineCounter(log_path(args.log_dir, args.range)).update(), args.range, name)
+        except ValueError as e:
+            reply = f"Error: {e}\n"
+    sys.stdout.write(reply)
+
+
+if __name__ == '__main__':
+    main()
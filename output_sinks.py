@@ -0,0 +1,326 @@
+"""Output sinks for exported account rows.
+
+Every sink takes (address, balance_sun) rows through write_rows() and
+buffers at most batch_size of them before writing, so memory stays
+bounded however many accounts are exported. Balances are kept as integer
+sun; the SQLite sink also stores the TRX value in trx_balance for existing
+queries.
+
+    sink = open_sink('parquet', 'tron_balances.parquet')
+    sink.write_rows(rows)
+    sink.close()
+"""
+
+import csv
+import os
+import sqlite3
+
+SUN_PER_TRX = 1_000_000
+
+FORMATS = ('sqlite', 'csv', 'parquet', 'arrow')
+
+# Columns of the exported account rows, as (name, type) pairs. Column types
+# are 'text', 'integer', 'real' and 'bool'.
+ACCOUNT_COLUMNS = (('address', 'text'), ('balance_sun', 'integer'))
+
+DEFAULT_OUTPUTS = {
+    'sqlite': 'tron_balances.db',
+    'csv': 'tron_balances.csv',
+    'parquet': 'tron_balances.parquet',
+    'arrow': 'tron_balances.arrow',
+}
+
+
+def setup_database(db_file):
+    """Sets up the SQLite database and creates the accounts table."""
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS accounts (
+            address TEXT PRIMARY KEY,
+            trx_balance REAL,
+            balance_sun INTEGER
+        )
+    ''')
+    # Databases written before balance_sun was added. The backfill from the
+    # REAL column is exact up to about 9 billion TRX.
+    columns = [row[1] for row in c.execute("PRAGMA table_info(accounts)")]
+    if 'balance_sun' not in columns:
+        c.execute("ALTER TABLE accounts ADD COLUMN balance_sun INTEGER")
+        c.execute("UPDATE accounts SET balance_sun = CAST(ROUND(trx_balance * 1000000) AS INTEGER)")
+    create_balance_index(conn)
+    conn.commit()
+    return conn
+
+
+def create_balance_index(conn):
+    """Creates the balance index used by top-N, range and rank queries."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_accounts_balance ON accounts (balance_sun)")
+
+
+def setup_bulk_database(db_file, cache_size_mb=512, page_size=65536):
+    """Sets up the SQLite database for a bulk load.
+
+    The accounts table is recreated without a primary key so rows can be
+    appended without B-tree maintenance; the unique address index is built
+    by finish_bulk_load() once all rows are in.
+    """
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    # page_size only takes effect before the first table is created.
+    c.execute(f"PRAGMA page_size = {int(page_size)}")
+    c.execute("PRAGMA journal_mode = OFF")
+    c.execute("PRAGMA synchronous = OFF")
+    c.execute(f"PRAGMA cache_size = {-int(cache_size_mb) * 1024}")
+    c.execute("PRAGMA temp_store = MEMORY")
+    c.execute("DROP TABLE IF EXISTS accounts")
+    c.execute('''
+        CREATE TABLE accounts (
+            address TEXT,
+            trx_balance REAL,
+            balance_sun INTEGER
+        )
+    ''')
+    conn.commit()
+    return conn
+
+
+def finish_bulk_load(conn):
+    """Builds the address and balance indexes after a bulk load."""
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_address ON accounts (address)")
+    create_balance_index(conn)
+    conn.commit()
+
+
+def sqlite_rows(rows):
+    """Converts (address, balance_sun) rows to accounts table rows."""
+    return [(address, balance_sun / SUN_PER_TRX, balance_sun) for address, balance_sun in rows]
+
+
+def flush_rows(conn, rows, bulk=False):
+    """Writes a batch of (address, balance_sun) rows in a single transaction."""
+    if not rows:
+        return
+    if bulk:
+        sql = "INSERT INTO accounts (address, trx_balance, balance_sun) VALUES (?, ?, ?)"
+    else:
+        sql = "INSERT OR REPLACE INTO accounts (address, trx_balance, balance_sun) VALUES (?, ?, ?)"
+    with conn:
+        conn.executemany(sql, sqlite_rows(rows))
+
+
+class OutputSink:
+    """Base class: buffers rows and hands full batches to write_batch()."""
+
+    def __init__(self, path, batch_size=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.rows = []
+        self.written = 0
+
+    def write_rows(self, rows):
+        """Buffers rows and writes every full batch_size slice; the rest waits for more rows or flush()."""
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size:
+            full = len(self.rows) - len(self.rows) % self.batch_size
+            for start in range(0, full, self.batch_size):
+                self.write_batch(self.rows[start:start + self.batch_size])
+            self.written += full
+            del self.rows[:full]
+
+    def flush(self):
+        """Writes the buffered rows, however many."""
+        if self.rows:
+            self.write_batch(self.rows)
+            self.written += len(self.rows)
+            self.rows = []
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def abort(self):
+        """Closes the output after a failed export, without writing buffered rows or finishing it."""
+        self.rows = []
+
+
+class SqliteSink(OutputSink):
+    """Writes rows to the accounts table of a SQLite database."""
+
+    def __init__(self, path, batch_size=10000, bulk=False, cache_size_mb=512, page_size=65536):
+        super().__init__(path, batch_size)
+        self.bulk = bulk
+        if bulk:
+            self.conn = setup_bulk_database(path, cache_size_mb, page_size)
+        else:
+            self.conn = setup_database(path)
+        # A full export rewrites accounts behind the back of the fingerprints
+        # kept by incremental_export; drop them so the next incremental run
+        # starts over instead of trusting them.
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS account_state")
+            self.conn.execute("DROP TABLE IF EXISTS export_meta")
+
+    def write_batch(self, rows):
+        flush_rows(self.conn, rows, self.bulk)
+
+    def close(self):
+        self.flush()
+        if self.bulk:
+            print("\nBuilding address and balance indexes...")
+            finish_bulk_load(self.conn)
+        self.conn.close()
+
+    def abort(self):
+        # Committed batches stay; a bulk load is left without its indexes.
+        super().abort()
+        self.conn.close()
+
+
+_SQLITE_TYPES = {'text': 'TEXT', 'integer': 'INTEGER', 'real': 'REAL', 'bool': 'INTEGER'}
+
+
+class SqliteTableSink(OutputSink):
+    """Writes rows to a table of a SQLite database.
+
+    The table is recreated first, unless append is set.
+    """
+
+    def __init__(self, path, table, columns, batch_size=10000, append=False):
+        super().__init__(path, batch_size)
+        self.conn = sqlite3.connect(path)
+        column_defs = ', '.join(f'"{name}" {_SQLITE_TYPES[kind]}' for name, kind in columns)
+        with self.conn:
+            if not append:
+                self.conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({column_defs})')
+        placeholders = ', '.join('?' * len(columns))
+        self.sql = f'INSERT INTO "{table}" VALUES ({placeholders})'
+
+    def write_batch(self, rows):
+        with self.conn:
+            self.conn.executemany(self.sql, rows)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def abort(self):
+        super().abort()
+        self.conn.close()
+
+
+class CsvSink(OutputSink):
+    """Writes rows to a CSV file with a header line.
+
+    With append, rows are added to an existing file and the header is only
+    written to a new or empty one.
+    """
+
+    def __init__(self, path, batch_size=10000, columns=ACCOUNT_COLUMNS, append=False):
+        super().__init__(path, batch_size)
+        self.file = open(path, 'a' if append else 'w', newline='', encoding='utf-8', buffering=1 << 20)
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow([name for name, _ in columns])
+
+    def write_batch(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def abort(self):
+        super().abort()
+        self.file.close()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("The parquet and arrow formats need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+class ArrowSink(OutputSink):
+    """Writes rows as record batches to an Arrow IPC file or a Parquet file.
+
+    Each batch becomes one record batch (one row group for Parquet).
+    """
+
+    def __init__(self, path, batch_size=10000, parquet=False, columns=ACCOUNT_COLUMNS):
+        super().__init__(path, batch_size)
+        pa = _import_pyarrow()
+        self.pa = pa
+        arrow_types = {'text': pa.string(), 'integer': pa.int64(), 'real': pa.float64(), 'bool': pa.bool_()}
+        self.schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+        if parquet:
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            import pyarrow.ipc
+            self.writer = pa.ipc.new_file(path, self.schema)
+        self.parquet = parquet
+
+    def write_batch(self, rows):
+        columns = zip(*rows)
+        batch = self.pa.record_batch([self.pa.array(values, field.type)
+                                      for values, field in zip(columns, self.schema)],
+                                     schema=self.schema)
+        if self.parquet:
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write(batch)
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def abort(self):
+        # Closing the writer adds the footer, which would make the truncated
+        # file look complete, so it is removed instead.
+        super().abort()
+        self.writer.close()
+        os.remove(self.path)
+
+
+def open_sink(fmt, path=None, batch_size=10000, **sqlite_options):
+    """Opens the output sink for fmt ('sqlite', 'csv', 'parquet' or 'arrow').
+
+    sqlite_options (bulk, cache_size_mb, page_size) are passed to SqliteSink.
+    """
+    if path is None:
+        path = DEFAULT_OUTPUTS[fmt]
+    if fmt == 'sqlite':
+        return SqliteSink(path, batch_size, **sqlite_options)
+    if fmt == 'csv':
+        return CsvSink(path, batch_size)
+    if fmt == 'parquet':
+        return ArrowSink(path, batch_size, parquet=True)
+    if fmt == 'arrow':
+        return ArrowSink(path, batch_size)
+    raise ValueError(f"Unknown output format '{fmt}'")
+
+
+def open_table_sink(fmt, path, table, columns, batch_size=10000, append=False):
+    """Opens a sink for rows with the given (name, type) columns.
+
+    For 'sqlite', rows go to the named table of the database at path;
+    for the file formats path is the output file. append keeps existing
+    rows ('sqlite' and 'csv' only).
+    """
+    if fmt == 'sqlite':
+        return SqliteTableSink(path, table, columns, batch_size, append)
+    if fmt == 'csv':
+        return CsvSink(path, batch_size, columns, append)
+    if append:
+        raise ValueError(f"The {fmt} format cannot be appended to")
+    if fmt == 'parquet':
+        return ArrowSink(path, batch_size, parquet=True, columns=columns)
+    if fmt == 'arrow':
+        return ArrowSink(path, batch_size, columns=columns)
+    raise ValueError(f"Unknown output format '{fmt}'")
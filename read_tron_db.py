@@ -1,32 +1,190 @@
 import argparse
+import multiprocessing
+import queue
 import rocksdict
-from core.Tron_pb2 import Account
-import base58
 import sqlite3
 import sys
+from core.Tron_pb2 import Account
+import time
+from address_codec import encode_address
+from balance_query import build_summaries
+from export_metrics import ExportMetrics, estimate_num_keys
+from export_pipeline import ExportPipeline
+from incremental_export import export_incremental
+from output_sinks import FORMATS, open_sink, setup_database
+from rocks_open import ScanSettings, add_scan_arguments, database_identity, open_for_scan, scan_read_options, settings_from_args
+from tron_wire import decode_account_balance
+
+def decode_account(key, value, min_balance, full_parse=False):
+    """Decodes one account record into an (address, balance_sun) row.
+
+    Only the balance field is read from the wire format unless full_parse
+    is set. Returns None when the account is below min_balance.
+    """
+    if full_parse:
+        account = Account()
+        account.ParseFromString(value)
+        balance_sun = account.balance
+    else:
+        balance_sun = decode_account_balance(value)
+    balance_trx = balance_sun / 1_000_000
+
+    if balance_trx < min_balance:
+        return None
+    address_b58 = encode_address(key)
+    return (address_b58, balance_sun)
+
+def key_ranges(num_ranges, prefix=b'\x41'):
+    """Splits the key space into num_ranges disjoint [lower, upper) ranges.
+
+    Tron account keys are 21-byte addresses starting with a network prefix
+    byte (0x41 on mainnet), so the split is made on the byte following the
+    prefix. The first range has no lower bound and the last no upper bound,
+    so keys outside the prefix are still covered.
+    """
+    num_ranges = max(1, min(num_ranges, 256))
+    bounds = [prefix + bytes([i * 256 // num_ranges]) for i in range(1, num_ranges)]
+    lowers = [None] + bounds
+    uppers = bounds + [None]
+    return list(zip(lowers, uppers))
+
+def scan_range_worker(db_path, cf_name, min_balance, batch_size, full_parse, settings, tasks, results):
+    """Worker process: decodes account key ranges taken from the tasks queue.
+
+    Each worker opens its own read-only handle with the cache and readahead
+    of settings. Batches of rows are put on the results queue as
+    ('rows', rows, counts), where counts holds the processed, skipped and
+    failed counts and the first errors since the previous batch. A final
+    ('done', None, None) is sent when the tasks queue is drained.
+    """
+    db = open_for_scan(db_path, ScanSettings(
+        mode='read-only', block_cache_mb=settings.block_cache_mb, max_open_files=settings.max_open_files,
+        readahead_mb=settings.readahead_mb, fill_cache=settings.fill_cache))
+    account_cf = db.get_column_family(cf_name)
+    read_opt = scan_read_options(settings)
 
-def setup_database(db_file):
-    """Sets up the SQLite database and creates the accounts table."""
+    def new_counts():
+        return {'processed': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+
+    counts = new_counts()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        lower, upper = task
+        rows = []
+        # Seek to the range start and stop at its end by hand: rocksdict does
+        # not apply ReadOptions iterate bounds to raw-mode keys.
+        items = account_cf.items(from_key=lower, read_opt=read_opt)
+        for key, value in items:
+            if upper is not None and key >= upper:
+                break
+            counts['processed'] += 1
+            try:
+                row = decode_account(key, value, min_balance, full_parse)
+            except Exception as e:
+                counts['failed'] += 1
+                if len(counts['errors']) < 5:
+                    counts['errors'].append({'key': key.hex(), 'error': f"{type(e).__name__}: {e}"})
+                continue
+            if row is None:
+                counts['skipped'] += 1
+            else:
+                rows.append(row)
+            if len(rows) >= batch_size:
+                results.put(('rows', rows, counts))
+                rows = []
+                counts = new_counts()
+        results.put(('rows', rows, counts))
+        counts = new_counts()
+    db.close()
+    results.put(('done', None, None))
+
+def scan_parallel(db_path, cf_name, min_balance, batch_size, workers, key_prefix, full_parse=False,
+                  settings=None):
+    """Scans the account column family with several worker processes.
+
+    Yields (rows, counts) batches as they arrive from the workers; see
+    scan_range_worker for counts.
+    """
+    if settings is None:
+        settings = ScanSettings()
+    ctx = multiprocessing.get_context('spawn')
+    tasks = ctx.Queue()
+    # Bounded so fast workers cannot run far ahead of the SQLite writer.
+    results = ctx.Queue(maxsize=workers * 4)
+    for key_range in key_ranges(workers * 4, key_prefix):
+        tasks.put(key_range)
+    for _ in range(workers):
+        tasks.put(None)
+
+    procs = [ctx.Process(target=scan_range_worker,
+                         args=(db_path, cf_name, min_balance, batch_size, full_parse, settings,
+                               tasks, results))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+
+    running = workers
+    try:
+        while running:
+            try:
+                kind, rows, counts = results.get(timeout=5)
+            except queue.Empty:
+                if not any(p.is_alive() for p in procs):
+                    raise RuntimeError("Worker processes exited unexpectedly.")
+                continue
+            if kind == 'done':
+                running -= 1
+            else:
+                yield rows, counts
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+
+def write_summaries(db_file):
+    """Rebuilds the rank, percentile and histogram tables used by balance_query.py."""
+    start = time.monotonic()
     conn = sqlite3.connect(db_file)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS accounts (
-            address TEXT PRIMARY KEY,
-            trx_balance REAL
-        )
-    ''')
-    conn.commit()
-    return conn
+    try:
+        build_summaries(conn)
+    finally:
+        conn.close()
+    print(f"Built balance summaries in {time.monotonic() - start:.1f}s.")
+
 
 def main():
-    parser = argparse.ArgumentParser(description='Read account data from a Tron RocksDB database and export to SQLite.')
+    parser = argparse.ArgumentParser(description='Read account data from a Tron RocksDB database and export to SQLite, CSV, Parquet or Arrow.')
     parser.add_argument('db_path', type=str, help='Path to the Tron RocksDB database directory.')
     parser.add_argument('--db-file', type=str, default='tron_balances.db', help='Path to the SQLite database file.')
+    parser.add_argument('--format', type=str, choices=FORMATS, default='sqlite', help='Output format.')
+    parser.add_argument('--output', type=str, help='Output file for --format csv, parquet or arrow (default tron_balances.<format>).')
     parser.add_argument('--min-balance', type=float, default=0, help='Minimum TRX balance to export.')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Number of rows written per SQLite transaction or output record batch.')
+    parser.add_argument('--bulk', action='store_true', help='Recreate the accounts table and load it with bulk-load pragmas, indexing after the load.')
+    parser.add_argument('--sqlite-cache-mb', type=int, default=512, help='SQLite page cache size in MB for --bulk.')
+    parser.add_argument('--sqlite-page-size', type=int, default=65536, help='SQLite page size in bytes for --bulk.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes decoding disjoint key ranges.')
+    parser.add_argument('--full-parse', action='store_true', help='Parse each record into a full Account message instead of reading only the balance field.')
+    parser.add_argument('--key-prefix', type=str, default='41', help='Hex address prefix byte used to split key ranges for --workers.')
+    parser.add_argument('--incremental', action='store_true', help='Only write accounts that were added, changed or removed since the previous incremental export.')
+    parser.add_argument('--memory-limit-mb', type=int, default=256, help='Memory ceiling for batches queued between the export pipeline stages.')
+    parser.add_argument('--decode-processes', type=int, default=0, help='Worker processes for the pipeline decoder stage (0 decodes in a thread).')
+    parser.add_argument('--metrics-file', type=str, help='Write progress and stage metrics as JSON to this file.')
+    parser.add_argument('--prometheus-file', type=str, help='Write metrics in Prometheus textfile-collector format to this file.')
+    add_scan_arguments(parser)
     args = parser.parse_args()
+    scan_settings = settings_from_args(args)
+
+    if args.incremental and (args.bulk or args.workers > 1 or args.format != 'sqlite'):
+        print("Error: --incremental cannot be combined with --bulk, --workers or a non-SQLite --format.")
+        return
+    output_file = args.db_file if args.format == 'sqlite' else args.output
 
     try:
-        db = rocksdict.Rdict(args.db_path, options=rocksdict.Options(raw_mode=True))
+        db = open_for_scan(args.db_path, scan_settings)
     except Exception as e:
         print(f"Error opening RocksDB database: {e}")
         return
@@ -50,40 +208,102 @@ def main():
         db.close()
         return
 
-    conn = setup_database(args.db_file)
-    c = conn.cursor()
+    metrics = ExportMetrics(estimate_num_keys(account_cf), args.metrics_file, args.prometheus_file)
 
-    count = 0
-    exported_count = 0
-    # Iterate over the key-value pairs in the account column family.
-    for key, value in account_cf.items():
-        count += 1
-        if count % 100000 == 0:
-            sys.stdout.write(f"\rProcessed {count} accounts...")
-            sys.stdout.flush()
+    if args.incremental:
+        setup_database(args.db_file).close()
 
-        try:
-            account = Account()
-            account.ParseFromString(value)
+        def report_incremental(processed):
+            metrics.processed = processed
+            metrics.maybe_report()
 
-            balance_sun = account.balance
-            balance_trx = balance_sun / 1_000_000
+        def decode(key, value, min_balance):
+            return decode_account(key, value, min_balance, args.full_parse)
 
-            if balance_trx >= args.min_balance:
-                address_b58 = base58.b58encode_check(key).decode('utf-8')
+        counts = export_incremental(account_cf, args.db_file, decode, args.min_balance, args.batch_size,
+                                    db.latest_sequence_number(), report_incremental,
+                                    scan_read_options(scan_settings), metrics.record_failure,
+                                    database_identity(args.db_path))
+        db.close()
+        metrics.processed = counts['added'] + counts['changed'] + counts['unchanged']
+        metrics.exported = counts['exported']
+        metrics.finish()
+        print(f"\nDone in {metrics.elapsed():.1f}s. Added {counts['added']}, changed {counts['changed']}, "
+              f"removed {counts['removed']}, unchanged {counts['unchanged']} accounts; "
+              f"wrote {counts['exported']} rows to '{args.db_file}'.")
+        if counts['failed']:
+            print(f"{counts['failed']} added or changed records could not be decoded; "
+                  f"they are retried on the next run.")
+            for error in metrics.errors[:5]:
+                print(f"Failed key {error['key']}: {error['error']}")
+        if counts['added'] or counts['changed'] or counts['removed']:
+            write_summaries(args.db_file)
+        return
+
+    try:
+        sink = open_sink(args.format, output_file, args.batch_size, **(
+            dict(bulk=args.bulk, cache_size_mb=args.sqlite_cache_mb, page_size=args.sqlite_page_size)
+            if args.format == 'sqlite' else {}))
+    except Exception as e:
+        print(f"Error opening output: {e}")
+        db.close()
+        return
 
-                c.execute("INSERT OR REPLACE INTO accounts (address, trx_balance) VALUES (?, ?)",
-                          (address_b58, balance_trx))
-                exported_count += 1
+    def write_rows(rows):
+        t = time.perf_counter()
+        sink.write_rows(rows)
+        metrics.stage_seconds['write'] += time.perf_counter() - t
 
-        except Exception:
-            pass
+    pipeline = None
+    try:
+        if args.workers > 1:
+            # Workers open their own read-only handles; release ours first.
+            db.close()
+            db = None
+            print(f"Scanning with {args.workers} worker processes")
+            for batch, counts in scan_parallel(args.db_path, account_cf_name, args.min_balance,
+                                               args.batch_size, args.workers,
+                                               bytes.fromhex(args.key_prefix), args.full_parse,
+                                               scan_settings):
+                metrics.add(counts['processed'], counts['skipped'], counts['failed'], len(batch), counts['errors'])
+                write_rows(batch)
+                metrics.maybe_report()
+        else:
+            # Reader, decoder, filter and writer stages over bounded queues.
+            pipeline = ExportPipeline(account_cf.items(read_opt=scan_read_options(scan_settings)), sink.write_rows,
+                                      metrics, args.min_balance, args.batch_size, args.full_parse,
+                                      args.memory_limit_mb, args.decode_processes)
+            pipeline.run()
+    except Exception as e:
+        print(f"\nError during export: {e}")
+        # Neither finish the load nor finalize a file that would look complete.
+        sink.abort()
+        if db is not None:
+            db.close()
+        if args.format in ('parquet', 'arrow'):
+            print(f"Export incomplete; '{sink.path}' was removed.")
+        else:
+            print(f"Export incomplete; '{sink.path}' holds only part of the accounts.")
+        return 1
 
-    conn.commit()
-    conn.close()
-    db.close()
+    t = time.perf_counter()
+    sink.flush()
+    load_elapsed = metrics.elapsed()
+    sink.close()
+    metrics.stage_seconds['write'] += time.perf_counter() - t
+    if pipeline is not None:
+        # The final flush and close (with bulk index builds) are writer work too.
+        pipeline.busy['writer'] += time.perf_counter() - t
+    if db is not None:
+        db.close()
+    metrics.finish()
 
-    print(f"\nDone. Processed {count} accounts and exported {exported_count} to '{args.db_file}'.")
+    print(f"\nDone. Processed {metrics.processed} accounts and exported {metrics.exported} to '{sink.path}'.")
+    print(f"Load: {metrics.exported / max(load_elapsed, 1e-9):,.0f} rows/s over {load_elapsed:.1f}s, total {metrics.elapsed():.1f}s.")
+    for line in metrics.summary_lines():
+        print(line)
+    if args.format == 'sqlite':
+        write_summaries(sink.path)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Opening a Tron RocksDB database for full sequential scans.
+
+rocksdict.Rdict(path) opens the database read-write with default options:
+it takes the DB lock, may replay the WAL or start compactions on our copy,
+and iterates through a small block cache that every scanned block is
+inserted into. For a one-off sequential scan the database is opened here
+read-only (or as a secondary instance of a running node), with a large
+readahead and without filling the block cache during iteration.
+
+Scan settings come from the command line through add_scan_arguments() and
+settings_from_args(); iterators must be created with the ReadOptions from
+scan_read_options(), since Rdict.set_read_options() does not apply to
+iteration.
+"""
+
+import os
+import tempfile
+
+import rocksdict
+
+OPEN_MODES = ('read-only', 'secondary', 'read-write')
+
+
+class ScanSettings:
+    """How to open the database and read it for a full scan."""
+
+    def __init__(self, mode='read-only', secondary_path=None, block_cache_mb=32,
+                 max_open_files=-1, readahead_mb=8, fill_cache=False):
+        self.mode = mode
+        self.secondary_path = secondary_path
+        self.block_cache_mb = block_cache_mb
+        self.max_open_files = max_open_files
+        self.readahead_mb = readahead_mb
+        self.fill_cache = fill_cache
+
+
+# The settings rocksdict uses when nothing is configured, for comparison.
+DEFAULT_SETTINGS = ScanSettings(mode='read-write', block_cache_mb=None, max_open_files=None,
+                                readahead_mb=None, fill_cache=True)
+
+
+def add_scan_arguments(parser):
+    """Adds the RocksDB open and scan options to an argparse parser."""
+    parser.add_argument('--open-mode', type=str, choices=OPEN_MODES, default='read-only',
+                        help='How to open the RocksDB database. read-only does not take the DB lock; '
+                             'secondary follows a running node.')
+    parser.add_argument('--secondary-path', type=str,
+                        help='Directory for the secondary instance\'s own files (--open-mode secondary).')
+    parser.add_argument('--block-cache-mb', type=int, default=32, help='RocksDB block cache size in MB.')
+    parser.add_argument('--max-open-files', type=int, default=-1,
+                        help='Maximum number of SST files kept open (-1 keeps all open).')
+    parser.add_argument('--readahead-mb', type=int, default=8, help='Iterator readahead size in MB.')
+
+
+def settings_from_args(args):
+    return ScanSettings(mode=args.open_mode, secondary_path=args.secondary_path,
+                        block_cache_mb=args.block_cache_mb, max_open_files=args.max_open_files,
+                        readahead_mb=args.readahead_mb)
+
+
+def scan_options(settings):
+    """Returns the rocksdict Options for settings."""
+    options = rocksdict.Options(raw_mode=True)
+    if settings.max_open_files is not None:
+        options.set_max_open_files(settings.max_open_files)
+    if settings.block_cache_mb is not None:
+        table_options = rocksdict.BlockBasedOptions()
+        table_options.set_block_cache(rocksdict.Cache(settings.block_cache_mb << 20))
+        options.set_block_based_table_factory(table_options)
+    return options
+
+
+def scan_read_options(settings):
+    """Returns the ReadOptions to pass to items() for a sequential scan."""
+    read_opt = rocksdict.ReadOptions()
+    if not settings.fill_cache:
+        read_opt.fill_cache(False)
+    if settings.readahead_mb:
+        read_opt.set_readahead_size(settings.readahead_mb << 20)
+    return read_opt
+
+
+def open_for_scan(path, settings=None):
+    """Opens the database at path according to settings (ScanSettings())."""
+    if settings is None:
+        settings = ScanSettings()
+    options = scan_options(settings)
+    if settings.mode == 'read-only':
+        access_type = rocksdict.AccessType.read_only()
+    elif settings.mode == 'secondary':
+        secondary_path = settings.secondary_path or os.path.join(tempfile.gettempdir(), 'tron_db_secondary')
+        # A secondary instance needs max_open_files = -1.
+        options.set_max_open_files(-1)
+        access_type = rocksdict.AccessType.secondary(secondary_path)
+    else:
+        access_type = rocksdict.AccessType.read_write()
+    db = rocksdict.Rdict(path, options=options, access_type=access_type)
+    if settings.mode == 'secondary':
+        db.try_catch_up_with_primary()
+    return db
+
+
+def database_identity(path):
+    """Returns the unique id RocksDB wrote to the IDENTITY file at creation.
+
+    Copies of a database keep its identity; together with the sequence
+    number it tells whether two databases hold the same data. Falls back
+    to the absolute path when the file is missing.
+    """
+    try:
+        with open(os.path.join(path, 'IDENTITY'), encoding='ascii', errors='replace') as f:
+            identity = f.read().strip()
+    except OSError:
+        identity = ''
+    return identity or os.path.abspath(path)
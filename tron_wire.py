@@ -0,0 +1,123 @@
+"""Partial decoding of Tron protobuf records.
+
+Parsing a full core.Tron_pb2.Account builds every vote, frozen entry and
+asset/assetV2 map item even when only the balance is needed. Here a slim
+message type is generated that declares just the requested top-level
+fields, with the same numbers and types as in Tron.proto. The protobuf
+runtime then walks the wire format once, decodes those fields and skips
+everything else as unknown data, so the values are exactly those of a
+full ParseFromString.
+
+The transfer contract messages, which core/ has no bindings for, are
+declared here the same way.
+"""
+
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+from google.protobuf.descriptor import FieldDescriptor
+
+from core.Tron_pb2 import Account
+
+_pool = descriptor_pool.DescriptorPool()
+_slim_classes = {}
+
+
+def _is_repeated(field):
+    # FieldDescriptor.label was replaced by is_repeated in newer protobuf releases.
+    if hasattr(field, 'is_repeated'):
+        return field.is_repeated
+    return field.label == FieldDescriptor.LABEL_REPEATED
+
+
+def slim_message_class(message_type, names):
+    """Returns a message class that only knows the given fields of message_type.
+
+    Only non-repeated scalar, string and bytes fields are supported; enum
+    fields are declared as int32, which has the same wire encoding.
+    """
+    key = (message_type.DESCRIPTOR.full_name, tuple(names))
+    cls = _slim_classes.get(key)
+    if cls is not None:
+        return cls
+
+    descriptor = message_type.DESCRIPTOR
+    fields = []
+    for name in names:
+        field = descriptor.fields_by_name.get(name)
+        if field is None:
+            raise ValueError(f"{descriptor.name} has no field '{name}'")
+        if _is_repeated(field) or field.type in (
+                FieldDescriptor.TYPE_MESSAGE, FieldDescriptor.TYPE_GROUP):
+            raise ValueError(f"Field '{name}' is not a singular scalar field")
+        field_type = field.type
+        if field_type == FieldDescriptor.TYPE_ENUM:
+            field_type = FieldDescriptor.TYPE_INT32
+        fields.append((name, field.number, field_type))
+    cls = _build_class('Slim' + str(len(_slim_classes)), fields)
+    _slim_classes[key] = cls
+    return cls
+
+
+def declared_message_class(name, fields):
+    """Returns a message class for a message that core/ has no bindings for.
+
+    fields are (name, number, FieldDescriptor.TYPE_*) tuples of singular
+    scalar, string or bytes fields, copied from the java-tron .proto file.
+    """
+    key = (name, tuple(fields))
+    cls = _slim_classes.get(key)
+    if cls is None:
+        cls = _slim_classes[key] = _build_class(name, fields)
+    return cls
+
+
+def _build_class(message_name, fields):
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f'tron_wire/{message_name}.proto', package='tron_wire', syntax='proto3')
+    message_proto = file_proto.message_type.add(name=message_name)
+    for name, number, field_type in fields:
+        message_proto.field.add(name=name, number=number, type=field_type,
+                                label=FieldDescriptor.LABEL_OPTIONAL)
+    _pool.Add(file_proto)
+    return message_factory.GetMessageClass(_pool.FindMessageTypeByName(f'tron_wire.{message_name}'))
+
+
+def decode_fields(message_type, value, names):
+    """Decodes the named top-level fields of an encoded message_type record.
+
+    Returns a tuple of values in the order of names.
+    """
+    message = slim_message_class(message_type, tuple(names)).FromString(value)
+    return tuple(getattr(message, name) for name in names)
+
+
+def decode_account_fields(value, names=('balance',)):
+    """Decodes the named fields (e.g. balance, address, create_time) of an Account."""
+    return decode_fields(Account, value, names)
+
+
+_AccountBalance = slim_message_class(Account, ('balance',))
+
+
+def decode_account_balance(value):
+    """Returns the balance (in sun) of an encoded Account record."""
+    return _AccountBalance.FromString(value).balance
+
+
+# From java-tron protocol/src/main/protos/core/contract/*.proto.
+TransferContract = declared_message_class('TransferContract', (
+    ('owner_address', 1, FieldDescriptor.TYPE_BYTES),
+    ('to_address', 2, FieldDescriptor.TYPE_BYTES),
+    ('amount', 3, FieldDescriptor.TYPE_INT64),
+))
+TransferAssetContract = declared_message_class('TransferAssetContract', (
+    ('asset_name', 1, FieldDescriptor.TYPE_BYTES),
+    ('owner_address', 2, FieldDescriptor.TYPE_BYTES),
+    ('to_address', 3, FieldDescriptor.TYPE_BYTES),
+    ('amount', 4, FieldDescriptor.TYPE_INT64),
+))
+TriggerSmartContract = declared_message_class('TriggerSmartContract', (
+    ('owner_address', 1, FieldDescriptor.TYPE_BYTES),
+    ('contract_address', 2, FieldDescriptor.TYPE_BYTES),
+    ('call_value', 3, FieldDescriptor.TYPE_INT64),
+    ('data', 4, FieldDescriptor.TYPE_BYTES),
+))
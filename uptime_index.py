@@ -0,0 +1,270 @@
+"""Persistent index of which hosts appear in which log file.
+
+Log files never change once their day is over, and archivelogs.sh rolls
+them into logs.bkup/logs.YYYY-MM-DD.tar.gz archives. Each log (or archive
+member) is scanned once and the IPv4 addresses found in it as whole lines
+are stored in a SQLite index as a sorted array of 32-bit addresses. A log
+is identified by its base name and day, so a log indexed while live and
+again from its archive has one entry, taken from the archive.
+Later runs skip files whose path, mtime and size are unchanged and drop
+the entries of files that no longer exist; queries read only the index.
+
+    python uptime_index.py index *.log ../logs.bkup
+    python uptime_index.py matrix --since 2025-03-01 --until 2025-03-31
+    python uptime_index.py host 192.168.155.40 --days 90
+"""
+
+import argparse
+import datetime
+import glob
+import ipaddress
+import os
+import re
+import socket
+import sqlite3
+import sys
+import tarfile
+
+from uptime_matrix import BLOCK_SIZE, DEFAULT_RANGE, expand_ranges, write_csv, write_json, write_text
+
+IPV4_LINE = re.compile(rb'(?:\d{1,3}\.){3}\d{1,3}')
+DATE_IN_NAME = re.compile(r'(\d{4}-\d{2}-\d{2})')
+DEFAULT_INDEX = 'uptime_index.db'
+
+
+def setup_index(index_file):
+    conn = sqlite3.connect(index_file)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(logs)")]
+    if columns and 'log' not in columns:
+        # Index from an older version, keyed by path; it is only a cache.
+        conn.execute("DROP TABLE logs")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sources (
+            source TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS logs (
+            log TEXT NOT NULL,
+            day TEXT NOT NULL,
+            source TEXT NOT NULL,
+            member TEXT NOT NULL,
+            hosts BLOB NOT NULL,
+            PRIMARY KEY (log, day)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_day ON logs (day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_source ON logs (source)")
+    if columns and 'log' not in columns:
+        conn.execute("DELETE FROM sources")
+    conn.commit()
+    return conn
+
+
+def pack_hosts(ips):
+    """Packs IPv4 address strings into a sorted array of 4-byte addresses."""
+    return b''.join(sorted({socket.inet_aton(ip) for ip in ips}))
+
+
+def unpack_hosts(blob):
+    """Returns the set of IPv4 address strings in a packed host array."""
+    return {socket.inet_ntoa(blob[i:i + 4]) for i in range(0, len(blob), 4)}
+
+
+def ips_in_stream(f):
+    """Returns the IPv4 addresses that appear as whole lines in a binary stream."""
+    found = set()
+
+    def add_lines(lines):
+        for line in lines:
+            if line not in found and IPV4_LINE.fullmatch(line):
+                found.add(line)
+
+    tail = b''
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            break
+        split = (tail + block).split(b'\n')
+        tail = split.pop()
+        add_lines(set(split))
+    add_lines([tail])
+    ips = []
+    for line in found:
+        text = line.decode('ascii')
+        # Only canonical dotted quads, the form range expansion produces.
+        try:
+            if str(ipaddress.IPv4Address(text)) == text:
+                ips.append(text)
+        except ValueError:
+            continue
+    return ips
+
+
+def log_day(name, fallback_mtime):
+    """Returns the YYYY-MM-DD day of a log, from its name or its mtime."""
+    match = DATE_IN_NAME.search(os.path.basename(name))
+    if match:
+        return match.group(1)
+    return datetime.date.fromtimestamp(fallback_mtime).isoformat()
+
+
+def is_archive(path):
+    return path.endswith(('.tar.gz', '.tgz', '.tar'))
+
+
+def expand_paths(paths):
+    """Expands directories into the *.log files and archives they contain."""
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ('*.log', '*.tar.gz', '*.tgz'):
+                yield from sorted(glob.glob(os.path.join(path, pattern)))
+        else:
+            yield path
+
+
+def prune_missing(conn):
+    """Drops the entries of indexed files that no longer exist. Returns their number."""
+    missing = [source for source, in conn.execute("SELECT source FROM sources")
+               if not os.path.exists(source)]
+    if not missing:
+        return 0
+    with conn:
+        conn.executemany("DELETE FROM sources WHERE source = ?", [(source,) for source in missing])
+        conn.executemany("DELETE FROM logs WHERE source = ?", [(source,) for source in missing])
+        # A file whose entries were all replaced by the dropped ones (a live
+        # log replaced by its archive) is scanned again to fill the gap.
+        conn.execute("DELETE FROM sources WHERE source NOT IN (SELECT source FROM logs)")
+    return len(missing)
+
+
+def store_log(conn, row):
+    """Stores a (log, day, source, member, hosts) entry, keeping the better of two copies of a log.
+
+    An archived copy wins over a live log, then the greater path, so the
+    outcome does not depend on the order of the runs. A file whose entry
+    is replaced is scanned again on the next run, in case it was not the
+    same log after all.
+    """
+    log, day, source, member, _ = row
+    existing = conn.execute("SELECT source, member FROM logs WHERE log = ? AND day = ?", (log, day)).fetchone()
+    if existing is not None:
+        if (existing[1] != '', existing[0]) > (member != '', source):
+            return
+        conn.execute("DELETE FROM sources WHERE source = ?", (existing[0],))
+    conn.execute("INSERT OR REPLACE INTO logs (log, day, source, member, hosts) VALUES (?, ?, ?, ?, ?)", row)
+
+
+def index_paths(conn, paths, verbose=True):
+    """Indexes new or changed logs and archives. Returns (indexed, skipped, pruned)."""
+    indexed = skipped = 0
+    pruned = prune_missing(conn)
+    for path in expand_paths(paths):
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            print(f"Error: cannot read '{path}': {e.strerror}", file=sys.stderr)
+            continue
+        known = conn.execute("SELECT COUNT(*) FROM sources WHERE source = ? AND mtime = ? AND size = ?",
+                             (path, st.st_mtime, st.st_size)).fetchone()[0]
+        if known:
+            skipped += 1
+            continue
+        rows = []
+        if is_archive(path):
+            # Stream mode: members are decompressed and read in order.
+            with tarfile.open(path, 'r|*') as archive:
+                for member in archive:
+                    if not member.isfile() or not member.name.endswith('.log'):
+                        continue
+                    ips = ips_in_stream(archive.extractfile(member))
+                    # Dated like a live log: the archive name only tells when
+                    # archivelogs.sh ran.
+                    rows.append((os.path.basename(member.name), log_day(member.name, member.mtime),
+                                 path, member.name, pack_hosts(ips)))
+        else:
+            with open(path, 'rb') as f:
+                ips = ips_in_stream(f)
+            rows.append((os.path.basename(path), log_day(path, st.st_mtime), path, '', pack_hosts(ips)))
+        with conn:
+            conn.execute("DELETE FROM logs WHERE source = ?", (path,))
+            for row in rows:
+                store_log(conn, row)
+            conn.execute("INSERT OR REPLACE INTO sources (source, mtime, size) VALUES (?, ?, ?)",
+                         (path, st.st_mtime, st.st_size))
+        indexed += 1
+        if verbose:
+            print(f"Indexed {path} ({len(rows)} log{'s' if len(rows) != 1 else ''})", file=sys.stderr)
+    return indexed, skipped, pruned
+
+
+def load_logs(conn, since=None, until=None):
+    """Returns [(label, day, hosts)] for the indexed logs between since and until, in day order."""
+    sql = "SELECT source, member, day, hosts FROM logs WHERE 1 = 1"
+    params = []
+    if since:
+        sql += " AND day >= ?"
+        params.append(since)
+    if until:
+        sql += " AND day <= ?"
+        params.append(until)
+    sql += " ORDER BY day, log"
+    return [(f"{os.path.basename(source)}:{member}" if member else os.path.basename(source), day, unpack_hosts(blob))
+            for source, member, day, blob in conn.execute(sql, params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query a persistent host/log index for uptime reports.')
+    parser.add_argument('--index', type=str, default=DEFAULT_INDEX, help='Index database file.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_index = sub.add_parser('index', help='Index new or changed log files, directories and tar.gz archives.')
+    p_index.add_argument('paths', nargs='+', help='Log files, archives or directories containing them.')
+
+    p_matrix = sub.add_parser('matrix', help='Print the uptime matrix for a day range from the index.')
+    p_matrix.add_argument('--since', type=str, help='First day (YYYY-MM-DD).')
+    p_matrix.add_argument('--until', type=str, help='Last day (YYYY-MM-DD).')
+    p_matrix.add_argument('--range', action='append', dest='ranges',
+                          help=f'Address range, CIDR network or single address. Defaults to {DEFAULT_RANGE}.')
+    p_matrix.add_argument('--format', choices=('text', 'json', 'csv'), default='text', help='Output format.')
+
+    p_host = sub.add_parser('host', help='Print the uptime of one host over the last N days.')
+    p_host.add_argument('ip', type=str, help='Host address.')
+    p_host.add_argument('--days', type=int, default=90, help='Number of days back from today.')
+    args = parser.parse_args()
+
+    conn = setup_index(args.index)
+    if args.command == 'index':
+        indexed, skipped, pruned = index_paths(conn, args.paths)
+        print(f"Indexed {indexed} files, {skipped} unchanged, {pruned} removed.")
+    elif args.command == 'matrix':
+        logs = load_logs(conn, args.since, args.until)
+        ips = expand_ranges(args.ranges or [DEFAULT_RANGE])
+        labels = [label for label, _, _ in logs]
+        matrix = {ip: [ip in hosts for _, _, hosts in logs] for ip in ips}
+        if args.format == 'json':
+            write_json(matrix, labels, sys.stdout)
+        elif args.format == 'csv':
+            write_csv(matrix, labels, sys.stdout)
+        else:
+            write_text(matrix, sys.stdout)
+    else:
+        ip = str(ipaddress.IPv4Address(args.ip))
+        since = (datetime.date.today() - datetime.timedelta(days=args.days)).isoformat()
+        logs = load_logs(conn, since)
+        days = sorted({day for _, day, _ in logs})
+        up_days = sorted({day for _, day, hosts in logs if ip in hosts})
+        if not days:
+            print(f"No indexed logs since {since}.")
+        else:
+            print(f"{ip}: seen on {len(up_days)} of {len(days)} days since {since} "
+                  f"({100 * len(up_days) / len(days):.1f}%), in {sum(ip in hosts for _, _, hosts in logs)} "
+                  f"of {len(logs)} logs.")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Host uptime matrix over a set of log files.
+
+uptimes.sh runs `grep -Fxq IP FILE` once per (IP, log file) pair. Here
+every log file is read once, in blocks, and reduced to the set of wanted
+IPs that appear in it as a whole line (the same test as grep -Fx). The
+cost is therefore proportional to the total log size, not to IPs x files.
+
+The text output matches uptimes.sh: one line per IP, with an 'O' for
+every log the IP appears in and a '.' otherwise, in log file order.
+
+    python uptime_matrix.py                      # *.log in the current directory
+    python uptime_matrix.py --range 10.0.0.0/24 --format json logs/*.log
+"""
+
+import argparse
+import csv
+import glob
+import ipaddress
+import json
+import sys
+
+DEFAULT_RANGE = '192.168.155.21-200'
+BLOCK_SIZE = 1 << 24
+
+
+def parse_range(spec):
+    """Expands an address range spec into a list of IP strings.
+
+    Accepts a single address (10.0.0.5), a CIDR network (10.0.0.0/24, host
+    addresses only), a full range (10.0.0.5-10.0.0.20) or a range of the
+    last octet (10.0.0.5-20).
+    """
+    if '/' in spec:
+        return [str(ip) for ip in ipaddress.ip_network(spec, strict=False).hosts()]
+    if '-' in spec:
+        first, last = spec.split('-', 1)
+        first = ipaddress.ip_address(first.strip())
+        last = last.strip()
+        if '.' in last or ':' in last:
+            last = ipaddress.ip_address(last)
+        else:
+            last = ipaddress.ip_address(str(first).rsplit('.', 1)[0] + '.' + last)
+        if last < first:
+            raise ValueError(f"Empty address range '{spec}'")
+        return [str(ipaddress.ip_address(n)) for n in range(int(first), int(last) + 1)]
+    return [str(ipaddress.ip_address(spec.strip()))]
+
+
+def expand_ranges(specs):
+    """Expands several range specs into one list of IPs without duplicates."""
+    ips = []
+    seen = set()
+    for spec in specs:
+        for ip in parse_range(spec):
+            if ip not in seen:
+                seen.add(ip)
+                ips.append(ip)
+    return ips
+
+
+def hosts_in_log(path, wanted):
+    """Returns the subset of wanted (a set of bytes) found as whole lines in path."""
+    found = set()
+    tail = b''
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(BLOCK_SIZE)
+            if not block:
+                break
+            lines = (tail + block).split(b'\n')
+            tail = lines.pop()
+            found.update(wanted.intersection(lines))
+    if tail and tail in wanted:
+        found.add(tail)
+    return found
+
+
+def build_matrix(ips, log_files):
+    """Returns {ip: [present in log 0, present in log 1, ...]} for ips."""
+    wanted = {ip.encode('ascii') for ip in ips}
+    columns = [hosts_in_log(path, wanted) for path in log_files]
+    return {ip: [ip.encode('ascii') in hosts for hosts in columns] for ip in ips}
+
+
+def write_text(matrix, out):
+    for ip, row in matrix.items():
+        out.write(f"{ip} ->" + ''.join('O' if present else '.' for present in row) + '\n')
+
+
+def write_json(matrix, log_files, out):
+    json.dump({'logs': list(log_files),
+               'hosts': {ip: {'present': [int(p) for p in row], 'uptime': sum(row) / len(row) if row else 0.0}
+                         for ip, row in matrix.items()}},
+              out, indent=2)
+    out.write('\n')
+
+
+def write_csv(matrix, log_files, out):
+    writer = csv.writer(out)
+    writer.writerow(['ip'] + list(log_files) + ['uptime'])
+    for ip, row in matrix.items():
+        writer.writerow([ip] + [int(p) for p in row] + [f"{sum(row) / len(row):.4f}" if row else '0'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the host uptime matrix from log files of host IPs.')
+    parser.add_argument('logs', nargs='*', help='Log files, in column order. Defaults to *.log in the current directory.')
+    parser.add_argument('--range', action='append', dest='ranges',
+                        help=f'Address range, CIDR network or single address; repeat for several. Defaults to {DEFAULT_RANGE}.')
+    parser.add_argument('--format', choices=('text', 'json', 'csv'), default='text', help='Output format.')
+    args = parser.parse_args()
+
+    log_files = args.logs or sorted(glob.glob('*.log'))
+    ips = expand_ranges(args.ranges or [DEFAULT_RANGE])
+
+    matrix = build_matrix(ips, log_files)
+    if args.format == 'json':
+        write_json(matrix, log_files, sys.stdout)
+    elif args.format == 'csv':
+        write_csv(matrix, log_files, sys.stdout)
+    else:
+        write_text(matrix, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()